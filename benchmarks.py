@@ -0,0 +1,266 @@
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from csv import writer
+from datetime import datetime, timedelta
+from json import dumps, loads
+from logging import DEBUG, INFO, basicConfig, getLogger
+from os import environ
+from pathlib import Path
+from random import Random
+from subprocess import run
+from sys import executable
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Tuple
+
+ROW = List[str]
+log = getLogger(__name__)
+subjects = [
+    "REWE SAGT DANKE",
+    "PENNY SAGT DANKE",
+    "DB Vertrieb GmbH",
+    "NH Hotels",
+    "GitHub Inc.",
+    "Amazon EU S.a.r.l.",
+    "BVG Berlin",
+    "Stadtwerke",
+    "Lupo Lopez",
+    "John Smith",
+]
+
+
+def movements(rows: int, seed: int = 0) -> Iterator[Tuple[datetime, str, float, float]]:
+    """Yield chronological (timestamp, subject, value, saldo) tuples"""
+    random = Random(seed)
+    moment = datetime(2000, 1, 1, 8)
+    saldo = 1000.0
+    for index in range(rows):
+        moment += timedelta(minutes=random.randint(1, 600))
+        value = round(random.uniform(-200, 150), 2)
+        saldo = round(saldo + value, 2)
+        subject = f"{random.choice(subjects)} {index % 97}"
+        yield moment, subject, value, saldo
+
+
+def german(value: float) -> str:
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",").replace(" ", ".")
+
+
+def ingdiba_rows(rows: int) -> List[ROW]:
+    return [
+        [
+            f"{moment:%d.%m.%Y}",
+            f"{moment:%d.%m.%Y}",
+            subject,
+            "Lastschrift" if value < 0 else "Gutschrift",
+            f"Reference {index}",
+            german(saldo),
+            "EUR",
+            german(value),
+            "EUR",
+        ]
+        for index, (moment, subject, value, saldo) in enumerate(movements(rows))
+    ][::-1]
+
+
+def d1822_rows(rows: int) -> List[ROW]:
+    return [
+        [
+            "0123456789",
+            f"{moment:%d.%m.%Y %H:%M}",
+            f"{moment:%d.%m.%Y}",
+            "EUR",
+            german(value),
+            "",
+            "Kartenzahlung/-en" if value < 0 else "Gutschrift Überw.",
+            subject,
+            *[""] * 5,
+            f"Reference {index}",
+            *[""] * 4,
+        ]
+        for index, (moment, subject, value, _) in enumerate(movements(rows))
+    ][::-1]
+
+
+def revolut_rows(rows: int) -> List[ROW]:
+    header = "Type,Product,Started Date,Completed Date,Description,Amount,Fee,"
+    header += "Currency,State,Balance"
+    return [header.split(",")] + [
+        [
+            "CARD_PAYMENT" if value < 0 else "TRANSFER",
+            "Current",
+            f"{moment:%Y-%m-%d %H:%M:%S}",
+            f"{moment:%Y-%m-%d %H:%M:%S}",
+            subject,
+            f"{value:.2f}",
+            "0.00",
+            "EUR",
+            "COMPLETED",
+            f"{saldo:.2f}",
+        ]
+        for moment, subject, value, saldo in movements(rows)
+    ]
+
+
+extracts: Dict[str, Tuple[Callable[[int], List[ROW]], str, str]] = {
+    "ingdiba": (ingdiba_rows, ";", "latin-1"),
+    "1822direkt": (d1822_rows, ";", "latin-1"),
+    "revolut": (revolut_rows, ",", "utf-8"),
+}
+
+
+def write_extract(path: Path, bank: str, rows: int) -> None:
+    generate, delimiter, encoding = extracts[bank]
+    with open(path, "w", encoding=encoding, newline="") as output:
+        writer(output, delimiter=delimiter).writerows(generate(rows))
+
+
+def write_ledger(path: Path, rows: int, accounts: int = 3) -> None:
+    """Create a configuration directory holding a synthetic ledger"""
+    from ledger import __version__
+
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "version").write_text(__version__)
+    categories = "\n".join(
+        f"{subject.split()[0].lower()}:\n  - {subject}" for subject in subjects
+    )
+    (path / "categories.yaml").write_text(categories + "\n")
+    with open(path / "transactions.csv", "w", encoding="latin-1") as output:
+        csvfile = writer(output)
+        for account in range(accounts):
+            transactions = movements(rows // accounts, account)
+            for index, (moment, subject, value, saldo) in enumerate(transactions):
+                csvfile.writerow(
+                    [
+                        moment.date(),
+                        "payment",
+                        subject,
+                        f"Reference {index}",
+                        value,
+                        saldo,
+                        f"account{account}",
+                        moment.date(),
+                        f"{moment:%H:%M}",
+                        "" if value > 0 else subject.split()[0].lower(),
+                        "",
+                        "",
+                    ]
+                )
+    with open(path / "tags.csv", "w", encoding="latin-1") as output:
+        writer(output).writerows([["weekly", rowid] for rowid in range(1, rows, 7)])
+
+
+class Benchmark:
+    def __init__(self) -> None:
+        self.results: Dict[str, float] = {}
+        self.suffix = ""
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        name += self.suffix
+        start = perf_counter()
+        yield
+        self.results[name] = perf_counter() - start
+        log.info(f"{name:<32} {self.results[name]:10.4f}s")
+
+    def run(self, rows: int, home: Path, directory: Path) -> None:
+        """Time every step against a synthetic ledger stored in the home folder"""
+        from ledger import client
+        from ledger.categories import Categorizer
+        from ledger.database import SQLite
+        from ledger.output import Table
+        from ledger.queries import Filter, Query, numpy
+
+        self.suffix = f" @{rows}"
+        with self.timer("import"):
+            run([executable, "-c", "import ledger.client"], check=True)
+
+        write_ledger(home, rows)
+        for bank in extracts:
+            extract = directory / f"{bank}.csv"
+            write_extract(extract, bank, rows)
+            with self.timer(f"parse {bank}"):
+                client.parse_many([(extract, bank, f"new {bank}")])
+
+        db = SQLite(home)
+        with self.timer("load"):
+            db.load()
+        with self.timer("save full"):
+            db.write_csv(home)
+        db.transactions.categorize_many([(db.last("transactions"), "benchmark")])
+        with self.timer("save incremental"):
+            db.save()
+        with self.timer("check"):
+            db.transactions.check()
+        with self.timer("get_many"):
+            transactions = db.transactions.get_many()
+        for transaction in transactions:
+            transaction.category = ""
+        with self.timer("categorize"):
+            Categorizer(home / "categories.yaml")(transactions)
+        queries = [Query("value < -50"), Query("subject has REWE")]
+        with self.timer("filter"):
+            stack = Filter(transactions)
+            for query in queries:
+                stack.add(query)
+        if numpy is not None:
+            with self.timer("filter columnar"):
+                stack = Filter(transactions, columnar=True)
+                for query in queries:
+                    stack.add(query)
+        with self.timer("output"):
+            columns = ["date", "subject", "value", "saldo", "category"]
+            data = db.transactions.select(*columns, limit=10000)
+            table = Table(columns, data)
+            table.header()
+            table.rows()
+
+
+def compare(results: Dict[str, Dict[str, float]], version: str) -> None:
+    """Log the ratio between the results of a version and the previous one"""
+    versions = list(results)
+    if version not in versions or versions.index(version) == 0:
+        return
+    previous = versions[versions.index(version) - 1]
+    log.info(f"Compared to v{previous}:")
+    for name, seconds in results[version].items():
+        if results[previous].get(name):
+            log.info(f"{name:<32} {seconds / results[previous][name]:10.2f}x")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "-r",
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[10000],
+        help="Number of rows of the synthetic ledgers",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("benchmarks.json"),
+        help="File accumulating the results of each version",
+    )
+    parser.add_argument("-v", dest="verbose", action="store_true")
+    arguments = parser.parse_args()
+
+    basicConfig(level=DEBUG if arguments.verbose else INFO, format="%(message)s")
+
+    with TemporaryDirectory() as tmp_dir:
+        environ["HOME"] = tmp_dir
+        from ledger import __version__, home
+
+        benchmark = Benchmark()
+        for rows in arguments.rows:
+            log.info(f"Benchmarking v{__version__} with {rows} rows")
+            with TemporaryDirectory(dir=tmp_dir) as directory:
+                benchmark.run(rows, home, Path(directory))
+
+    results = loads(arguments.output.read_text()) if arguments.output.exists() else {}
+    results[__version__] = benchmark.results
+    arguments.output.write_text(dumps(results, indent=2) + "\n")
+    compare(results, __version__)
@@ -1,12 +1,16 @@
 from argparse import ArgumentParser
 from csv import reader, writer
+from functools import reduce
 from logging import DEBUG, INFO, basicConfig, getLogger
+from os import replace
 from pathlib import Path
-from typing import Any, List
+from sqlite3 import connect
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
 
 ROW = List[Any]
-ROWS = List[ROW]
+Converter = Callable[[ROW], ROW]
 log = getLogger(__name__)
+tables = ["transactions", "tags"]
 
 
 class Version(tuple):
@@ -17,34 +21,134 @@ class Version(tuple):
         return ".".join((str(n) for n in self))
 
 
-def read(path: Path) -> ROWS:
+def read(path: Path) -> Iterator[ROW]:
     log.info(f"Reading table from {path}")
     with open(path, encoding="latin-1") as csvfile:
-        rows = list(reader(csvfile))
-    return rows
+        yield from reader(csvfile)
 
 
-def write(rows: ROWS, path: Path) -> None:
+def write(rows: Iterable[ROW], path: Path) -> Path:
+    """Write the rows next to the output file, which is replaced by migrate
+
+    The rows can be read from the output file itself, as it is only replaced
+    once every table was converted. Returns the path of the written file.
+    """
     log.info(f"Writing table to {path}")
-    with open(path, "w", encoding="latin-1") as output:
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "w", encoding="latin-1") as output:
         csvfile = writer(output)
         csvfile.writerows(rows)
+    return temporary
+
+
+def fuse(converters: Sequence[Converter]) -> Converter:
+    """Combine converters into one function applying them in order to a row"""
+    if len(converters) == 1:
+        return converters[0]
+    return lambda row: reduce(lambda row, converter: converter(row), converters, row)
 
 
-def add_time_column(rows):
-    log.info("- Adding 'time' column to table")
-    for row in rows:
-        row.insert(8, "")
-    return rows
+def add_time_column(row: ROW) -> ROW:
+    row.insert(8, "")
+    return row
 
 
-versions = [
-    (Version("0.2.0"), add_time_column),
+versions: List[Tuple[Version, Dict[str, Converter]]] = [
+    (Version("0.2.0"), {"transactions": add_time_column}),
 ]
 
 
+def migrate(source: Path, destination: Path, frm: Version, to: Version) -> str:
+    """Convert the tables of a directory from one version to another
+
+    Each table is read and written once, whatever the number of versions in
+    between, including the tables of ledger.db when it exists. Every output
+    is written to a temporary file first, and they replace the tables and the
+    version file of the destination only once all of them were written, so a
+    failure leaves the destination as it was. Returns the last version
+    reached, if any.
+    """
+    steps = [(version, step) for version, step in versions if frm < version <= to]
+    last = str(steps[-1][0]) if steps else ""
+    outputs = [destination / f"{table}.csv" for table in tables]
+    outputs += [destination / "ledger.db", destination / "version"]
+    written: List[Path] = []
+    try:
+        for table in tables:
+            converters = []
+            for version, step in steps:
+                if table in step:
+                    log.info(
+                        f"- Converting {table} to v{version}: {step[table].__name__}"
+                    )
+                    converters.append(step[table])
+            path = source / f"{table}.csv"
+            if not path.exists():
+                log.warning(f"Skipping missing table {path}")
+            elif converters:
+                written.append(
+                    write(map(fuse(converters), read(path)), destination / path.name)
+                )
+            elif source != destination:
+                written.append(write(read(path), destination / path.name))
+        if (source / "ledger.db").exists() and (steps or source != destination):
+            written.append(
+                migrate_database(source, destination, [step for _, step in steps])
+            )
+        version = destination / "version"
+        if last and version.exists():
+            version.with_suffix(".tmp").write_text(last)
+            written.append(version.with_suffix(".tmp"))
+    except BaseException:
+        for output in outputs:
+            output.with_suffix(".tmp").unlink(missing_ok=True)
+        raise
+    for output in outputs:
+        if output.with_suffix(".tmp") in written:
+            replace(output.with_suffix(".tmp"), output)
+    return last
+
+
+def migrate_database(
+    source: Path, destination: Path, steps: Sequence[Dict[str, Converter]]
+) -> Path:
+    """Convert the tables of ledger.db into a new database in a single pass
+
+    The new database is created with the schema of the installed version of
+    ledger in a temporary file, whose path is returned. Rowids are kept, as
+    tags refer to transactions by rowid.
+    """
+    from ledger.database import SQLite
+
+    log.info(f"Converting {source / 'ledger.db'}")
+    temporary = destination / "ledger.tmp"
+    temporary.unlink(missing_ok=True)
+    connection = connect(f"{(source / 'ledger.db').as_uri()}?mode=ro", uri=True)
+    db = SQLite(destination, persistent=True, database=temporary)
+    try:
+        db.begin()
+        with db.summaries.paused(), db.checkpoints.paused():
+            for table in tables:
+                convert = fuse([step[table] for step in steps if table in step])
+                columns = getattr(db, table).columns
+                names = ", ".join(f'"{column}"' for column in columns)
+                values = ", ".join(["?"] * (len(columns) + 1))
+                rows = connection.execute(
+                    f"SELECT rowid, * FROM {table} ORDER BY rowid"
+                )
+                db.connection.executemany(
+                    f"INSERT INTO {table} (rowid, {names}) VALUES ({values})",
+                    ([rowid, *convert(list(row))] for rowid, *row in rows),
+                )
+        db.connection.execute("COMMIT")
+    finally:
+        db.connection.close()
+        connection.close()
+    return temporary
+
+
 if __name__ == "__main__":
-    default_path = Path.home() / ".config/ledger/transactions.csv"
+    default_path = Path.home() / ".config/ledger"
     parser = ArgumentParser()
     parser.add_argument("-f", "--frm", help="Initial version")
     parser.add_argument(
@@ -55,37 +159,30 @@ if __name__ == "__main__":
         "--input",
         type=Path,
         default=default_path,
-        help="Path to the input file",
+        help="Directory holding the tables to convert",
     )
     parser.add_argument(
         "-o",
         "--output",
         type=Path,
         default=default_path,
-        help="Path to the output file",
+        help="Directory to write the converted tables to",
     )
-    parser.add_argument("-v", dest="verbose")
+    parser.add_argument("-v", dest="verbose", action="store_true")
     arguments = parser.parse_args()
 
     basicConfig(level=DEBUG if arguments.verbose else INFO, format="%(message)s")
 
-    version_path = arguments.output.parent / "version"
+    version_path = arguments.output / "version"
     if version_path.exists():
         with open(version_path) as version_file:
             initial_version = Version(version_file.readline().strip())
-        if arguments.frm and arguments.frm != initial_version:
+        if arguments.frm and Version(arguments.frm) != initial_version:
             raise ValueError(f"Version mismatch: {arguments.frm} != {initial_version}")
         arguments.frm = str(initial_version)
+    if not arguments.frm:
+        parser.error("the initial version is required without a version file")
 
-    rows = read(arguments.input)
-    last_version = ""
-    for version, converter in versions:
-        if version >= Version(arguments.frm) and version <= Version(arguments.to):
-            log.info(f"Converting to v{version}")
-            rows = converter(rows)
-            last_version = str(version)
-    write(rows, arguments.output)
-
-    if last_version and version_path.exists():
-        with open(version_path, "w") as version_file:
-            version_file.write(last_version)
+    migrate(
+        arguments.input, arguments.output, Version(arguments.frm), Version(arguments.to)
+    )
@@ -1,10 +1,12 @@
+from hashlib import sha256
 from logging import getLogger
+from os import replace
 from pathlib import Path
-from typing import List, NamedTuple
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from re import compile, escape
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
 
-from yaml import safe_load
-
-from . import home
+from . import __version__, home
 from .database import Transaction
 
 log = getLogger(__name__)
@@ -16,10 +18,43 @@ class Category(NamedTuple):
 
 
 class Categorizer:
-    def __init__(self, path: Path = home / "categories.yaml"):
-        with open(path) as yml:
-            data = safe_load(yml)
-        self.categories = self.unpack(data)
+    def __init__(self, path: Path = home / "categories.yaml", cache: bool = False):
+        if cache:
+            self.categories, self.matcher = self.load(path)
+        else:
+            self.categories = self.unpack(read_yaml(path.read_bytes()))
+            self.matcher = Matcher(self.categories)
+
+    def load(self, path: Path) -> Tuple[List[Category], "Matcher"]:
+        """Read the categories from a pickled cache stored next to the file
+
+        The cache is trusted as long as the modification time and size of the
+        file are unchanged, and otherwise validated against its content hash.
+        """
+        cache_path = path.with_suffix(".cache")
+        stat = path.stat()
+        key = (__version__, stat.st_mtime_ns, stat.st_size)
+        cache: Dict[str, Any] = {}
+        try:
+            cache = loads(cache_path.read_bytes())
+        except Exception as error:
+            log.debug(f"Ignoring categories cache: {error}")
+        if cache.get("key") == key:
+            return cache["categories"], cache["matcher"]
+        content = path.read_bytes()
+        digest = sha256(content).hexdigest()
+        if cache.get("digest") != digest or cache.get("key", ())[:1] != key[:1]:
+            log.debug(f"Compiling categories from {path}")
+            categories = self.unpack(read_yaml(content))
+            cache = {"categories": categories, "matcher": Matcher(categories)}
+        cache.update(key=key, digest=digest)
+        temporary = cache_path.with_suffix(".tmp")
+        try:
+            temporary.write_bytes(dumps(cache, HIGHEST_PROTOCOL))
+            replace(temporary, cache_path)
+        except OSError as error:
+            log.warning(f"Unable to write categories cache: {error}")
+        return cache["categories"], cache["matcher"]
 
     def unpack(self, data: dict, prefix: str = "") -> List[Category]:
         pack: List[Category] = []
@@ -35,15 +70,86 @@ class Categorizer:
                 raise ValueError("Invalid categories file")
         return pack
 
-    def __call__(self, transactions: List[Transaction]) -> None:
+    def __call__(self, transactions: Iterable[Transaction]) -> None:
         for transaction in transactions:
-            for category in self.categories:
-                for keyword in category.keywords:
-                    if keyword in transaction.subject:
-                        if transaction.category and transaction.category != category:
-                            log.warning(
-                                f"Transaction {transaction.subject} is already "
-                                "categorized as {transaction.category}, not {category}"
-                            )
-                        else:
-                            transaction.category = category.name
+            matches = self.matcher(transaction.subject)
+            if not matches:
+                continue
+            if transaction.category:
+                conflicts = [name for name in matches if name != transaction.category]
+            else:
+                transaction.category, *conflicts = matches
+            for category in conflicts:
+                log.warning(
+                    f"Transaction {transaction.subject} is already "
+                    f"categorized as {transaction.category}, not {category}"
+                )
+
+
+def read_yaml(content: bytes) -> Any:
+    from yaml import safe_load
+
+    return safe_load(content)
+
+
+class Matcher:
+    """Find the categories whose keywords appear in a text in a single scan
+
+    All keywords are compiled into one regular expression shaped as a prefix
+    tree and wrapped in a lookahead, so that every position where a keyword
+    starts is reported. The tree matches the longest keyword at each position,
+    so the other keywords matching there are its prefixes, which are resolved
+    from a precomputed table.
+    """
+
+    def __init__(self, categories: List[Category]):
+        self.names = [category.name for category in categories]
+        self.index: Dict[str, List[int]] = {}
+        for position, category in enumerate(categories):
+            for keyword in category.keywords:
+                positions = self.index.setdefault(str(keyword), [])
+                if position not in positions:
+                    positions.append(position)
+        keywords = list(self.index)
+        self.prefixes = {
+            keyword: sorted(
+                {
+                    position
+                    for prefix in keywords
+                    if keyword.startswith(prefix)
+                    for position in self.index[prefix]
+                }
+            )
+            for keyword in keywords
+        }
+        self.pattern: Optional[Pattern[str]] = None
+        if keywords:
+            self.pattern = compile(f"(?=({trie(keywords)}))")
+
+    def __call__(self, text: str) -> List[str]:
+        """Return the names of the matching categories in priority order"""
+        if self.pattern is None:
+            return []
+        matches = set()
+        for match in self.pattern.finditer(text):
+            matches.update(self.prefixes[match.group(1)])
+        return [self.names[position] for position in sorted(matches)]
+
+
+def trie(keywords: Iterable[str]) -> str:
+    """Build a regular expression matching the longest of the given keywords"""
+    root: dict = {}
+    for keyword in keywords:
+        node = root
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[None] = {}
+
+    def pattern(node: dict) -> str:
+        branches = [escape(char) + pattern(node[char]) for char in node if char]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{group})?" if None in node else group
+
+    return pattern(root)
@@ -1,48 +1,152 @@
 from argparse import ArgumentParser
+from datetime import date as day
+from fnmatch import fnmatch
+from glob import glob, has_magic
 from logging import DEBUG, INFO, basicConfig, getLogger
+from os import replace
 from pathlib import Path
-from sys import stdout
-
-from colorful import bold, green, grey, red, yellow  # type: ignore
-from IPython import start_ipython  # type: ignore
-from traitlets.config import Config  # type: ignore
+from sys import stderr, stdout
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
+from . import home, profiling
 from .categories import Categorizer
-from .database import SQLite
-from .parsers import parsers
+from .database import SQLite, Transaction, check_version, populated
+from .parsers import detect, parsers
+from .profiling import span
+from .utils import batched
+
+
+Job = Tuple[Path, str, str]
 
 
 def parse(filename: Path, bank: str, account: str = "") -> None:
-    account = account or bank
-    transactions = parsers[bank](filename, account)
+    parse_many([(filename, bank, account or bank)])
+
+
+def parse_many(jobs: Sequence[Job], processes: Optional[int] = None) -> None:
+    """Import several bank extracts in a single load and save of the database
+
+    Files are parsed in parallel when there is more than one. The extracts of
+    each account are imported starting from the one with the oldest first
+    transaction, so that rows keep their chronological order.
+    """
     db = SQLite()
     db.load()
-    last_transaction = db.transactions.get_one(
-        account=account, order="rowid", direction="DESC"
-    )
-    if last_transaction:
-        new_transactions = transactions[transactions.index(last_transaction) + 1 :]
-        assert len(new_transactions) < len(transactions), (
-            "No matching transaction found"
-        )
+    checkpoint = db.last("transactions")
+    accounts: Dict[str, List[Iterable[Transaction]]] = {}
+    if len(jobs) == 1:
+        filename, bank, account = jobs[0]
+        accounts[account] = [parsers[bank](filename, account)]
     else:
-        new_transactions = transactions
-    log.info(f"Parsed {len(new_transactions)} new transactions")
-    categorizer = Categorizer()
-    categorizer(new_transactions)
-    db.transactions.add_many(new_transactions)
-    db.transactions.check(account)
+        from concurrent.futures import ProcessPoolExecutor
+
+        with span("read", len(jobs)), ProcessPoolExecutor(processes) as executor:
+            for (_, _, account), transactions in zip(jobs, executor.map(read, jobs)):
+                accounts.setdefault(account, []).append(transactions)
+        for extracts in accounts.values():
+            extracts.sort(key=first_date)
+    with span("categories"):
+        categorizer = Categorizer(cache=True)
+    count = 0
+    for account, extracts in accounts.items():
+        with span("keys") as record:
+            keys = db.transactions.keys(account)
+            record.rows += len(keys)
+        for transactions in extracts:
+            batches = batched(deduplicate(transactions, keys), 1000)
+            while True:
+                # Parsing and deduplication run lazily while pulling a batch
+                with span("parse") as record:
+                    batch = next(batches, [])
+                    record.rows += len(batch)
+                if not batch:
+                    break
+                with span("categorize", len(batch)):
+                    categorizer(batch)
+                with span("insert", len(batch)):
+                    db.transactions.add_many(batch)
+                count += len(batch)
+    log.info(f"Parsed {count} new transactions")
+    db.transactions.check(since=checkpoint)
     db.save()
 
 
-def categorize() -> None:
+def read(job: Job) -> List[Transaction]:
+    filename, bank, account = job
+    return list(parsers[bank](filename, account))
+
+
+def first_date(transactions: Iterable[Transaction]) -> day:
+    for transaction in transactions:
+        return transaction.date
+    return day.max
+
+
+def find(paths: Iterable[Path], banks: Dict[str, str], bank: str = "") -> List[Job]:
+    """Expand directories and glob patterns and assign a bank to each file
+
+    Banks are looked up in a mapping of file name patterns, falling back to
+    the given default and then to the signature found at the start of the file.
+    """
+    files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files += sorted(child for child in path.iterdir() if child.is_file())
+        elif not path.exists() and has_magic(str(path)):
+            files += sorted(Path(name) for name in glob(str(path)))
+        else:
+            files.append(path)
+    jobs = []
+    for path in files:
+        for pattern, name in banks.items():
+            if fnmatch(path.name, pattern):
+                break
+        else:
+            name = bank or detect(path) or ""
+        if not name:
+            raise ValueError(f"Unable to determine the bank of {path}")
+        jobs.append((path, name, name))
+    return jobs
+
+
+def deduplicate(
+    transactions: Iterable[Transaction], keys: Set[Tuple[Any, ...]]
+) -> Iterator[Transaction]:
+    """Skip the transactions whose primary key is already in the given set"""
+    for transaction in transactions:
+        if transaction.key in keys:
+            log.debug(f"Skipping known transaction {transaction}")
+            continue
+        keys.add(transaction.key)
+        yield transaction
+
+
+def categorize(bulk: bool = False) -> None:
+    from colorful import bold, green, grey, red, yellow  # type: ignore
+
     db = SQLite()
     db.load()
     categories = db.transactions.distinct("category")
-    transactions = db.transactions.get_many(category="", order="date", direction="DESC")
+    transactions = db.transactions.uncategorized()
+    subjects: Dict[str, List[int]] = {}
+    for rowid, transaction in transactions:
+        subjects.setdefault(transaction.subject, []).append(rowid)
+    updates: Dict[int, str] = {}
     print(f"{len(transactions)} transactions uncategorized")
     while transactions:
-        transaction = transactions.pop()
+        rowid, transaction = transactions.pop()
+        if rowid in updates:
+            continue
         print(
             f"{green(transaction.date)} {bold(transaction.subject)} "
             f"{grey(transaction.reference)} {yellow(transaction.value)}"
@@ -51,6 +155,7 @@ def categorize() -> None:
             substr = input(">>> ").strip()
         except EOFError:
             if input("Save changes? ") == "y":
+                db.transactions.categorize_many(updates.items())
                 db.save()
             return
         if substr in categories:
@@ -60,16 +165,22 @@ def categorize() -> None:
                 category = matches[0]
             else:
                 print(red("Matches: ") + ", ".join(matches))
-                transactions.append(transaction)
+                transactions.append((rowid, transaction))
                 continue
         else:
             if input("New category? ") != "y":
-                transactions.append(transaction)
+                transactions.append((rowid, transaction))
                 continue
             category = substr
             categories.add(category)
         stdout.write(f"\x1b[1A\x1b[2K{category}\n")
-        db.transactions.categorize(transaction, category)
+        updates[rowid] = category
+        if bulk:
+            rowids = subjects.pop(transaction.subject)
+            updates.update((other, category) for other in rowids)
+            if len(rowids) > 1:
+                print(grey(f"Applied to {len(rowids) - 1} more transactions"))
+    db.transactions.categorize_many(updates.items())
     db.save()
 
 
@@ -79,7 +190,41 @@ def sql():
     db.prompt()
 
 
+def sql_import(path: Path) -> None:
+    """Create the database file from CSV tables
+
+    The database is built in a temporary file, which only replaces ledger.db
+    once every table was imported.
+    """
+    check_version(home)
+    database = home / "ledger.db"
+    assert not populated(database), "The database is not empty"
+    temporary = database.with_suffix(".tmp")
+    temporary.unlink(missing_ok=True)
+    try:
+        db = SQLite(home, persistent=True, database=temporary)
+        db.begin()
+        db.read_csv(path)
+        db.connection.execute("COMMIT")
+        count = db.transactions.count()
+        db.connection.close()
+        replace(temporary, database)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    log.info(f"Imported {count} transactions into {database}")
+
+
+def sql_export(path: Path) -> None:
+    db = SQLite()
+    db.load()
+    db.write_csv(path)
+
+
 def shell():
+    from IPython import start_ipython  # type: ignore
+    from traitlets.config import Config  # type: ignore
+
     environment = Path(__file__).parent.absolute() / "shell.py"
     config = Config()
     shell_config = config.InteractiveShell
@@ -97,35 +242,104 @@ def shell():
 
 
 def run():
+    home.mkdir(parents=True, exist_ok=True)
     parser = ArgumentParser()
-    parser.add_argument("-v", dest="verbose")
+    parser.add_argument("-v", dest="verbose", action="store_true")
+    parser.add_argument(
+        "--profile", action="store_true", help="Print the time spent in each step"
+    )
+    parser.add_argument(
+        "--profile-json", type=Path, metavar="PATH", help="Dump the timings as JSON"
+    )
+    parser.add_argument(
+        "--cprofile", type=Path, metavar="PATH", help="Dump cProfile statistics"
+    )
     subparser = parser.add_subparsers(dest="command")
-    parse_command = subparser.add_parser("parse", help="Parse a bank extract")
-    parse_command.add_argument("filename", type=Path, help="CSV file to parse")
+    parse_command = subparser.add_parser("parse", help="Parse bank extracts")
+    parse_command.add_argument(
+        "filenames",
+        type=Path,
+        nargs="+",
+        help="CSV files, directories or glob patterns to parse",
+    )
     parse_command.add_argument("-a", "--account", help="Account to add transactions to")
     parse_command.add_argument(
         "-b", "--bank", choices=parsers.keys(), help="CSV file format"
     )
+    parse_command.add_argument(
+        "-m",
+        "--map",
+        action="append",
+        default=[],
+        metavar="PATTERN=BANK",
+        help="CSV file format of the files matching a pattern",
+    )
+    parse_command.add_argument(
+        "-j", "--jobs", type=int, help="Number of files to parse in parallel"
+    )
     sql_command = subparser.add_parser("sql")
     sql_subparser = sql_command.add_subparsers(dest="subcommand")
-    sql_export_command = sql_subparser.add_parser("export")
-    sql_export_command.add_argument("filename", type=Path, help="Output filename")
-    subparser.add_parser("categorize")
+    sql_import_command = sql_subparser.add_parser(
+        "import", help="Create the database file from CSV tables"
+    )
+    sql_import_command.add_argument(
+        "directory", type=Path, nargs="?", default=home, help="Input directory"
+    )
+    sql_export_command = sql_subparser.add_parser(
+        "export", help="Write the database tables as CSV files"
+    )
+    sql_export_command.add_argument("directory", type=Path, help="Output directory")
+    categorize_command = subparser.add_parser(
+        "categorize", help="Categorize transactions interactively"
+    )
+    categorize_command.add_argument(
+        "-s",
+        "--same-subject",
+        action="store_true",
+        help="Apply each category to all transactions with the same subject",
+    )
     arguments = parser.parse_args()
 
-    if arguments.command == "parse":
-        basicConfig(level=DEBUG if arguments.verbose else INFO, format="%(message)s")
-        parse(
-            arguments.filename,
-            arguments.bank,
-            arguments.account or arguments.bank,
-        )
-    elif arguments.command == "sql":
-        sql()
-    elif arguments.command == "categorize":
-        categorize()
-    else:
-        shell()
+    if arguments.cprofile:
+        from cProfile import Profile
+
+        profiler = Profile()
+        profiler.enable()
+    try:
+        if arguments.command == "parse":
+            basicConfig(
+                level=DEBUG if arguments.verbose else INFO, format="%(message)s"
+            )
+            banks = dict(mapping.rsplit("=", 1) for mapping in arguments.map)
+            for bank in banks.values():
+                assert bank in parsers, f"{bank} is not a valid bank"
+            jobs = find(arguments.filenames, banks, arguments.bank or "")
+            if arguments.account:
+                jobs = [(path, bank, arguments.account) for path, bank, _ in jobs]
+            parse_many(jobs, arguments.jobs)
+        elif arguments.command == "sql":
+            if arguments.subcommand:
+                basicConfig(
+                    level=DEBUG if arguments.verbose else INFO, format="%(message)s"
+                )
+            if arguments.subcommand == "import":
+                sql_import(arguments.directory)
+            elif arguments.subcommand == "export":
+                sql_export(arguments.directory)
+            else:
+                sql()
+        elif arguments.command == "categorize":
+            categorize(arguments.same_subject)
+        else:
+            shell()
+    finally:
+        if arguments.cprofile:
+            profiler.disable()
+            profiler.dump_stats(arguments.cprofile)
+        if arguments.profile:
+            print(profiling.report(), file=stderr)
+        if arguments.profile_json:
+            profiling.dump(arguments.profile_json)
 
 
 log = getLogger(__name__)
@@ -1,33 +1,45 @@
+from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
 from csv import reader, writer
 from dataclasses import astuple, dataclass, field
-from datetime import date as day
-from functools import wraps
+from datetime import date as day, timedelta
+from functools import lru_cache, wraps
+from io import SEEK_END
 from logging import getLogger
 from pathlib import Path
-from re import sub
+from re import Pattern, compile, sub
+from sqlite3 import OperationalError, connect
+from sys import intern
 from typing import (
     Any,
     Callable,
     Dict,
     Generic,
+    IO,
+    Iterable,
+    Iterator,
     List,
     Optional,
+    Sequence,
     Set,
     Tuple,
     Type,
     TypeVar,
 )
 
-from litecli.main import LiteCli, SQLExecute  # type: ignore
-
 from . import __version__, home
+from .profiling import span
+from .utils import isodate
 
 Row = TypeVar("Row")
 
 
-class MetaTable(type):
+class MetaTable(ABCMeta):
     def __new__(cls, name, bases, ns):
-        if name != "Table":
+        abstract = any(
+            getattr(value, "__isabstractmethod__", False) for value in ns.values()
+        )
+        if name != "Table" and not abstract:
             assert "schema" in ns, f"Must define a schema for Table {name}"
             columns = [column for column in ns["schema"].__annotations__]
             ns.update(name=name.lower(), columns=columns)
@@ -48,8 +60,10 @@ class Table(Generic[Row], metaclass=MetaTable):
     def __init__(self, connection):
         self.connection = connection
         self.columns = []
+        self.statements: Dict[Tuple[Any, ...], str] = {}
         columns = []
         primary_keys = []
+        indexes = []
         foreign_key = ""
         for column, attrs in self.schema.__dataclass_fields__.items():
             self.columns.append(column)
@@ -62,6 +76,8 @@ class Table(Generic[Row], metaclass=MetaTable):
                 columns[-1] += " NOT NULL"
             if attrs.metadata.get("primary"):
                 primary_keys.append(column)
+            if attrs.metadata.get("index"):
+                indexes.append(column)
             if attrs.metadata.get("reference"):
                 assert not foreign_key, "Feature not implemented: multiple foreign keys"
                 foreign_key = (
@@ -73,8 +89,15 @@ class Table(Generic[Row], metaclass=MetaTable):
             columns.append(f'PRIMARY KEY ("{keys}")')
         if foreign_key:
             columns.append(foreign_key)
-        command = f"CREATE TABLE {self.name} ({', '.join(columns)})"
-        connection.cursor().execute(command)
+        command = f"CREATE TABLE IF NOT EXISTS {self.name} ({', '.join(columns)})"
+        cursor = connection.cursor()
+        cursor.execute(command)
+        for column in indexes:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.name}_{column} "
+                f'ON {self.name} ("{column}")'
+            )
+        connection.create_function("REGEXP", 2, regexp, deterministic=True)
 
     def fetch(self, command: str) -> List[Tuple[Any, ...]]:
         cursor = self.connection.cursor()
@@ -87,17 +110,46 @@ class Table(Generic[Row], metaclass=MetaTable):
         order: str = "",
         direction: str = "ASC",
         limit: int = 0,
+        where: str = "",
+        parameters: Sequence[Any] = (),
         **kwargs,
     ) -> List[Tuple[Any, ...]]:
+        command = self.statement(args, tuple(kwargs), order, direction, limit, where)
+        values = [*kwargs.values(), *parameters]
+        if limit:
+            values.append(limit)
+        cursor = self.connection.cursor()
+        cursor.execute(command, values)
+        return cursor.fetchall()
+
+    def statement(
+        self,
+        args: Tuple[str, ...],
+        keys: Tuple[str, ...],
+        order: str,
+        direction: str,
+        limit: int,
+        where: str,
+    ) -> str:
+        """Build a parameterized SELECT statement, reusing previous ones
+
+        Identical statements let SQLite reuse its prepared statement cache.
+        Only statements made of keyword conditions are kept, as free-form
+        WHERE clauses could grow the cache without bound.
+        """
+        signature = (args, keys, order, direction, bool(limit))
+        if not where and signature in self.statements:
+            return self.statements[signature]
         all_columns = ["rowid"] + self.columns
-        for arg in args + tuple(kwargs.keys()):
+        for arg in args + keys:
             assert arg in all_columns, f"{arg} is not a valid column"
         columns = '", "'.join(args or self.columns)
         command = f'SELECT "{columns}" FROM {self.name}'
-        if kwargs:
-            command += " WHERE"
-            for column, value in kwargs.items():
-                command += f" {column}='{value}'"
+        conditions = [f'"{column}"=?' for column in keys]
+        if where:
+            conditions.append(f"({where})")
+        if conditions:
+            command += f" WHERE {' AND '.join(conditions)}"
         if order:
             assert order in all_columns, f"{order} is not a valid column"
             assert direction in [
@@ -106,10 +158,10 @@ class Table(Generic[Row], metaclass=MetaTable):
             ], f"{direction} is not a valid direction"
             command += f' ORDER BY "{order}" {direction}'
         if limit:
-            command += f" LIMIT {limit}"
-        cursor = self.connection.cursor()
-        cursor.execute(command)
-        return cursor.fetchall()
+            command += " LIMIT ?"
+        if not where:
+            self.statements[signature] = command
+        return command
 
     def insert(self, data: List[Tuple[Any, ...]]) -> None:
         cursor = self.connection.cursor()
@@ -123,12 +175,23 @@ class Table(Generic[Row], metaclass=MetaTable):
         return results[0] if results else None
 
     def get_many(
-        self, order: str = "", direction: str = "ASC", limit: int = 0, **kwargs
+        self,
+        order: str = "",
+        direction: str = "ASC",
+        limit: int = 0,
+        where: str = "",
+        parameters: Sequence[Any] = (),
+        **kwargs,
     ) -> List[Row]:
         return [
             self.schema(*row)
             for row in self.select(
-                order=order, direction=direction, limit=limit, **kwargs
+                order=order,
+                direction=direction,
+                limit=limit,
+                where=where,
+                parameters=parameters,
+                **kwargs,
             )
         ]
 
@@ -138,6 +201,19 @@ class Table(Generic[Row], metaclass=MetaTable):
     def add_many(self, rows: List[Row]) -> None:
         self.insert([astuple(row) for row in rows])
 
+    @contextmanager
+    def atomic(self) -> Iterator[None]:
+        """Group statements in a savepoint, which also works inside a transaction"""
+        cursor = self.connection.cursor()
+        cursor.execute(f"SAVEPOINT {self.name}")
+        try:
+            yield
+        except BaseException:
+            cursor.execute(f"ROLLBACK TO {self.name}")
+            raise
+        finally:
+            cursor.execute(f"RELEASE {self.name}")
+
     def distinct(self, column: str) -> Set[Any]:
         assert column in self.columns, f"{column} is not a valid column"
         command = f"SELECT DISTINCT {column} FROM {self.name} WHERE {column}!=''"
@@ -147,67 +223,150 @@ class Table(Generic[Row], metaclass=MetaTable):
         return self.fetch(f"SELECT COUNT(rowid) FROM {self.name}")[0][0]
 
 
-@dataclass
-class Transaction:
+class Keyed:
+    """Base for slotted records holding a precomputed primary key"""
+
+    __slots__ = ("key",)
+
+
+@dataclass(eq=False, slots=True)
+class Transaction(Keyed):
+    """A bank transaction, identified by its primary key fields
+
+    The primary key is computed once on creation and used for hashing and
+    equality, so those fields must not be modified afterwards. Fields with
+    few distinct values are interned to share memory across loaded rows.
+    """
+
     date: day = field(metadata={"primary": True})
     type: str
     subject: str
     reference: str
     value: float = field(metadata={"primary": True})
     saldo: float = field(metadata={"primary": True})
-    account: str = field(metadata={"primary": True})
+    account: str = field(metadata={"primary": True, "index": True})
     valuta: Optional[day] = field(default=None, metadata={"optional": True})
     time: Optional[str] = field(default="", metadata={"optional": True})
-    category: Optional[str] = field(default="", metadata={"optional": True})
+    category: Optional[str] = field(
+        default="", metadata={"optional": True, "index": True}
+    )
     location: Optional[str] = field(default="", metadata={"optional": True})
     comment: Optional[str] = field(default="", metadata={"optional": True})
 
     def __post_init__(self):
         if isinstance(self.date, str):
-            self.date = day.fromisoformat(self.date)
+            self.date = isodate(self.date)
         if self.valuta and isinstance(self.valuta, str):
-            self.valuta = day.fromisoformat(self.valuta)
+            self.valuta = isodate(self.valuta)
+        self.type = intern(self.type)
+        self.account = intern(self.account)
+        if self.category:
+            self.category = intern(self.category)
+        self.key: Tuple[Any, ...] = (self.date, self.value, self.saldo, self.account)
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Transaction):
             return False
-        return other.hash == self.hash
+        return other.key == self.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
 
     @property
-    def hash(self):
-        return {
-            key: getattr(self, key)
-            for key, field in self.__dataclass_fields__.items()
-            if field.metadata.get("primary")
-        }
+    def hash(self) -> Dict[str, Any]:
+        return dict(zip(primary_keys(Transaction), self.key))
+
+
+def primary_keys(schema: Type[Any]) -> List[str]:
+    return [
+        column
+        for column, attrs in schema.__dataclass_fields__.items()
+        if attrs.metadata.get("primary")
+    ]
 
 
 class Transactions(Table[Transaction]):
     schema = Transaction
 
-    def check(self, account: str = "") -> None:
-        count = self.fetch(f"SELECT COUNT(rowid) FROM {self.name}")
-        rowid = self.fetch(f"SELECT rowid FROM {self.name} ORDER BY rowid DESC LIMIT 1")
-        assert count == rowid, "The last rowid does not match the total number of rows"
-        accounts = [account] if account else self.distinct("account")
-        for account in accounts:
-            previous = None
-            transactions = self.select("value", "saldo", order="rowid", account=account)
-            for transaction in transactions:
-                if previous is not None:
-                    assert round(previous + transaction[0], 2) == transaction[1], (
-                        f"Error: {previous} + {transaction[0]} != {transaction[1]}"
+    def check(self, account: str = "", since: int = 0) -> int:
+        """Verify that the saldo of every row follows from the previous one
+
+        Rows are compared with the previous row of the same account in a
+        single query. Only rows after the given rowid are verified, together
+        with the last row of each of their accounts before it. Returns the
+        last verified rowid, to be used as the next checkpoint. Rowids may have
+        gaps, as database files keep them when rows are deleted.
+        """
+        last = self.fetch(f"SELECT MAX(rowid) FROM {self.name}")[0][0]
+        condition = "AND account=:account" if account else ""
+        command = f"""
+            WITH rows AS (
+                SELECT rowid, account, value, saldo FROM {self.name}
+                WHERE rowid>:since {condition}
+                UNION ALL
+                SELECT rowid, account, value, saldo FROM {self.name}
+                WHERE rowid IN (
+                    SELECT (
+                        SELECT MAX(rowid) FROM {self.name} AS previous
+                        WHERE previous.account=recent.account
+                        AND previous.rowid<=:since
                     )
-                previous = transaction[1]
+                    FROM (
+                        SELECT DISTINCT account FROM {self.name}
+                        WHERE rowid>:since {condition}
+                    ) AS recent
+                )
+            )
+            SELECT previous, value, saldo FROM (
+                SELECT value, saldo, LAG(saldo) OVER (
+                    PARTITION BY account ORDER BY rowid
+                ) AS previous
+                FROM rows
+            )
+            WHERE previous IS NOT NULL AND ROUND(previous + value, 2)!=saldo
+            LIMIT 1
+        """
+        cursor = self.connection.cursor()
+        with span("check", (last or 0) - since):
+            parameters = {"since": since, "account": account}
+            cursor.execute(sub(r"\s+", " ", command), parameters)
+            error = cursor.fetchone()
+        assert error is None, f"Error: {error[0]} + {error[1]} != {error[2]}"
+        return last or 0
+
+    def keys(self, account: str) -> Set[Tuple[Any, ...]]:
+        """Return the primary keys of all the transactions of an account"""
+        return {
+            (isodate(date), value, saldo, account)
+            for date, value, saldo in self.select(
+                "date", "value", "saldo", account=account
+            )
+        }
+
+    def uncategorized(self) -> List[Tuple[int, Transaction]]:
+        """Return the uncategorized transactions and their rowids, newest first"""
+        return [
+            (row[0], self.schema(*row[1:]))
+            for row in self.select(
+                "rowid", *self.columns, category="", order="date", direction="DESC"
+            )
+        ]
+
+    def categorize_many(self, categories: Iterable[Tuple[int, str]]) -> None:
+        """Apply categories given as (rowid, category) pairs in one transaction"""
+        with self.atomic():
+            cursor = self.connection.cursor()
+            cursor.executemany(
+                f"UPDATE {self.name} SET category=? WHERE rowid=?",
+                ((category, rowid) for rowid, category in categories),
+            )
 
     def categorize(self, transaction: Transaction, category: str) -> None:
         cursor = self.connection.cursor()
-        condition = [
-            f"{column}='{value}'" for column, value in transaction.hash.items()
-        ]
+        condition = " AND ".join(f'"{column}"=?' for column in transaction.hash)
         cursor.execute(
-            f"UPDATE transactions SET category='{category}' "
-            f"WHERE {' AND '.join(condition)}"
+            f"UPDATE {self.name} SET category=? WHERE {condition}",
+            (category, *transaction.key),
         )
 
 
@@ -221,38 +380,445 @@ class Tags(Table[Tag]):
     schema = Tag
 
 
+class Derived(Table[Row]):
+    """Table computed from the transactions and kept current by triggers"""
+
+    source = Transactions.name
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.track()
+
+    @abstractmethod
+    def triggers(self) -> Dict[str, str]:
+        """Return the body of each trigger, by event"""
+
+    @abstractmethod
+    def rebuild(self) -> None:
+        """Compute the whole table from the transactions"""
+
+    def track(self) -> None:
+        cursor = self.connection.cursor()
+        for event, trigger in self.triggers().items():
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {self.name}_{event} {trigger}"
+            )
+
+    def untrack(self) -> None:
+        cursor = self.connection.cursor()
+        for event in self.triggers():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {self.name}_{event}")
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Skip the triggers during bulk inserts and rebuild everything after"""
+        self.untrack()
+        try:
+            yield
+        finally:
+            self.rebuild()
+            self.track()
+
+
+@dataclass
+class Summary:
+    """Total and number of the transactions of an account in a month and category"""
+
+    account: str = field(metadata={"primary": True})
+    month: str = field(metadata={"primary": True})
+    category: str = field(metadata={"primary": True})
+    total: float
+    count: int
+
+
+class Summaries(Derived[Summary]):
+    """Monthly totals per category of each account"""
+
+    schema = Summary
+
+    def triggers(self) -> Dict[str, str]:
+        key = "account={row}.account AND month=substr({row}.date, 1, 7) "
+        key += "AND category=COALESCE({row}.category, '')"
+        add = (
+            f"INSERT INTO {self.name} VALUES (NEW.account, substr(NEW.date, 1, 7), "
+            "COALESCE(NEW.category, ''), NEW.value, 1) "
+            "ON CONFLICT DO UPDATE SET total=ROUND(total + excluded.total, 2), "
+            "count=count + 1"
+        )
+        remove = (
+            f"UPDATE {self.name} SET total=ROUND(total - OLD.value, 2), "
+            f"count=count - 1 WHERE {key.format(row='OLD')}; "
+            f"DELETE FROM {self.name} WHERE count=0 AND {key.format(row='OLD')}"
+        )
+        return {
+            "insert": f"AFTER INSERT ON {self.source} BEGIN {add}; END",
+            "update": (
+                "AFTER UPDATE OF date, value, account, category "
+                f"ON {self.source} BEGIN {remove}; {add}; END"
+            ),
+            "delete": f"AFTER DELETE ON {self.source} BEGIN {remove}; END",
+        }
+
+    def rebuild(self) -> None:
+        with self.atomic():
+            cursor = self.connection.cursor()
+            cursor.execute(f"DELETE FROM {self.name}")
+            cursor.execute(
+                f"INSERT INTO {self.name} "
+                "SELECT account, substr(date, 1, 7), COALESCE(category, ''), "
+                "ROUND(SUM(value), 2), COUNT(rowid) "
+                f"FROM {self.source} GROUP BY 1, 2, 3"
+            )
+
+
+@dataclass
+class Checkpoint:
+    """Saldo of an account after its last transaction of a month"""
+
+    account: str = field(metadata={"primary": True})
+    month: str = field(metadata={"primary": True})
+    saldo: float
+    transaction: int = field(metadata={"reference": Transactions})
+
+
+class Checkpoints(Derived[Checkpoint]):
+    """Monthly balances of each account, to look up balances at any date
+
+    Rows of an account are stored in chronological order, so the last rowid
+    of a month holds the saldo at the end of that month.
+    """
+
+    schema = Checkpoint
+
+    def triggers(self) -> Dict[str, str]:
+        add = (
+            f"INSERT INTO {self.name} VALUES (NEW.account, substr(NEW.date, 1, 7), "
+            "NEW.saldo, NEW.rowid) ON CONFLICT DO UPDATE SET saldo=excluded.saldo, "
+            '"transaction"=excluded."transaction" '
+            'WHERE excluded."transaction">"transaction"'
+        )
+        remove = (
+            f"DELETE FROM {self.name} WHERE account=OLD.account "
+            "AND month=substr(OLD.date, 1, 7); "
+            f"INSERT INTO {self.name} SELECT account, substr(date, 1, 7), saldo, "
+            f"MAX(rowid) FROM {self.source} WHERE account=OLD.account "
+            "AND substr(date, 1, 7)=substr(OLD.date, 1, 7) GROUP BY 1, 2"
+        )
+        return {
+            "insert": f"AFTER INSERT ON {self.source} BEGIN {add}; END",
+            "update": (
+                "AFTER UPDATE OF date, account, saldo "
+                f"ON {self.source} BEGIN {remove}; {add}; END"
+            ),
+            "delete": f"AFTER DELETE ON {self.source} BEGIN {remove}; END",
+        }
+
+    def rebuild(self) -> None:
+        with self.atomic():
+            cursor = self.connection.cursor()
+            cursor.execute(f"DELETE FROM {self.name}")
+            cursor.execute(
+                f"INSERT INTO {self.name} "
+                "SELECT account, substr(date, 1, 7), saldo, MAX(rowid) "
+                f"FROM {self.source} GROUP BY 1, 2"
+            )
+
+    def balance(self, account: str, at: day) -> float:
+        """Return the saldo of an account at the end of a day
+
+        The checkpoint of the previous month is found through the primary key
+        and only the transactions of the current month are scanned after it.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f'SELECT saldo FROM {self.source} WHERE "date">=? AND "date"<=? '
+            'AND account=? ORDER BY "date" DESC, rowid DESC LIMIT 1',
+            (at.replace(day=1), at, account),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                f"SELECT saldo FROM {self.name} WHERE account=? AND month<? "
+                "ORDER BY month DESC LIMIT 1",
+                (account, at.isoformat()[:7]),
+            )
+            row = cursor.fetchone()
+        return row[0] if row else 0.0
+
+    def accounts(self) -> List[str]:
+        return sorted(self.distinct("account"))
+
+    def net_worth(self, at: day) -> float:
+        """Return the sum of the balances of all accounts at the end of a day"""
+        return round(sum(self.balance(account, at) for account in self.accounts()), 2)
+
+    def series(self, start: day, end: day) -> List[Tuple[day, float]]:
+        """Return the net worth at the end of each day between two dates"""
+        previous = start - timedelta(days=1)
+        balances = {
+            account: self.balance(account, previous) for account in self.accounts()
+        }
+        total = sum(balances.values())
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f'SELECT "date", account, saldo FROM {self.source} '
+            'WHERE "date">=? AND "date"<=? ORDER BY "date", rowid',
+            (start, end),
+        )
+        changes = iter(cursor)
+        change = next(changes, None)
+        series = []
+        for offset in range((end - start).days + 1):
+            current = start + timedelta(days=offset)
+            while change is not None and isodate(change[0]) == current:
+                _, account, saldo = change
+                total += saldo - balances.get(account, 0.0)
+                balances[account] = saldo
+                change = next(changes, None)
+            series.append((current, round(total, 2)))
+        return series
+
+
 class SQLite:
-    def __init__(self, path: Path = Path.home() / ".config/ledger"):
+    tables = ["transactions", "tags"]
+
+    def __init__(
+        self,
+        path: Path = Path.home() / ".config/ledger",
+        persistent: Optional[bool] = None,
+        database: Optional[Path] = None,
+    ):
+        """Keep the tables in memory, or in a database file when persistent
+
+        The database file defaults to ledger.db in the given folder and is
+        only used automatically when it holds transactions.
+        """
         self.path = path
+        database = database or path / "ledger.db"
+        if persistent is None:
+            persistent = populated(database)
+            if not persistent and database.exists():
+                log.warning(f"Ignoring {database}, which holds no transactions")
+        self.persistent = persistent
         self.dirty = False
-        self.sqlexecute = SQLExecute(":memory:")
-        self.sqlexecute.run = tripwire(self.sqlexecute.run, self)
-        self.transactions = Transactions(self.sqlexecute.conn)
-        self.tags = Tags(self.sqlexecute.conn)
+        self.database = str(database) if persistent else ":memory:"
+        self.connection = connect(self.database, isolation_level=None)
+        self.transactions = Transactions(self.connection)
+        self.tags = Tags(self.connection)
+        self.summaries = Summaries(self.connection)
+        self.checkpoints = Checkpoints(self.connection)
+        self.saved: Dict[str, int] = {}
+        if not persistent:
+            self.track()
 
     def load(self) -> None:
-        with open(self.path / "version") as version_file:
-            version = version_file.readline().strip()
-            if version != __version__:
-                raise RuntimeError(f"Running v{__version__} != database v{version}")
-        for table in ["transactions", "tags"]:
-            with open(self.path / f"{table}.csv", encoding="latin-1") as csvfile:
-                getattr(self, table).insert(reader(csvfile))
+        check_version(self.path)
+        with span("load") as record:
+            if self.persistent:
+                self.begin()
+                if self.transactions.count():
+                    for table in [self.summaries, self.checkpoints]:
+                        if not table.count():
+                            table.rebuild()
+            else:
+                self.read_csv(self.path)
+                for table in self.tables:
+                    self.mark_saved(table, self.last(table))
+                    record.rows += self.saved[table]
 
     def save(self) -> None:
         log.info("Saving data")
-        for table in ["transactions", "tags"]:
-            with open(self.path / f"{table}.csv", "w", encoding="latin-1") as output:
-                csvfile = writer(output)
-                csvfile.writerows(getattr(self, table).select())
+        with span("save"):
+            if self.persistent:
+                self.connection.execute("COMMIT")
+                self.begin()
+            else:
+                for table in self.tables:
+                    self.update_csv(table)
+                self.connection.execute("DELETE FROM changes")
+
+    def write_snapshot(self) -> None:
+        """Store the transactions in a columnar file to be memory-mapped"""
+        from .snapshot import write
+
+        with span("snapshot", self.transactions.count()):
+            rows = self.transactions.select(order="rowid")
+            write(self.snapshot, rows, self.source)
+
+    @property
+    def snapshot(self) -> Path:
+        return self.path / "transactions.snapshot"
+
+    @property
+    def source(self) -> Path:
+        """File whose modifications make the snapshot outdated"""
+        return (
+            Path(self.database) if self.persistent else self.path / "transactions.csv"
+        )
+
+    def track(self) -> None:
+        """Record the rows modified since the CSV files were last written
+
+        Inserted rows are only recorded when they reuse a rowid already
+        written, as appended rows are found by comparing with the saved rowid.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(
+            "CREATE TEMP TABLE changes (name TEXT, row INTEGER, PRIMARY KEY(name, row))"
+        )
+        cursor.execute("CREATE TEMP TABLE saved (name TEXT PRIMARY KEY, row INTEGER)")
+        for table in self.tables:
+            record = (
+                f"BEGIN INSERT OR IGNORE INTO changes VALUES ('{table}', {{}}); END"
+            )
+            cursor.execute(
+                f"CREATE TEMP TRIGGER {table}_changes AFTER UPDATE ON main.{table} "
+                + record.format("OLD.rowid")
+            )
+            cursor.execute(
+                f"CREATE TEMP TRIGGER {table}_deletions AFTER DELETE ON main.{table} "
+                + record.format("OLD.rowid")
+            )
+            cursor.execute(
+                f"CREATE TEMP TRIGGER {table}_insertions AFTER INSERT ON main.{table} "
+                f"WHEN NEW.rowid<=(SELECT row FROM saved WHERE name='{table}') "
+                + record.format("NEW.rowid")
+            )
+
+    def mark_saved(self, table: str, last: int) -> None:
+        self.saved[table] = last
+        self.connection.execute(
+            "INSERT OR REPLACE INTO saved VALUES (?, ?)", (table, last)
+        )
+
+    def last(self, table: str) -> int:
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        return cursor.fetchone()[0] or 0
+
+    def update_csv(self, table: str) -> None:
+        """Write only the rows that were appended or modified since the last save
+
+        Rows are stored in rowid order, so a modified row forces rewriting the
+        file from that row onwards, while appended rows are added at its end.
+        Gaps in the rowids trigger a full rewrite.
+        """
+        path = self.path / f"{table}.csv"
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT COUNT(rowid), MAX(rowid) FROM {table}")
+        count, last = cursor.fetchone()
+        last = last or 0
+        saved = self.saved.get(table)
+        cursor.execute(
+            "SELECT MIN(row) FROM changes WHERE name=? AND row<=?", (table, saved)
+        )
+        changed = cursor.fetchone()[0]
+        if saved is None or count != last or last < saved:
+            self.write_table(table, path)
+        elif changed:
+            offset = csv_offset(path, changed - 1)
+            with open(path, "r+b") as output:
+                output.truncate(offset)
+            self.append_rows(table, path, changed)
+        elif last > saved:
+            self.append_rows(table, path, saved + 1)
+        self.mark_saved(table, last)
+
+    def append_rows(self, table: str, path: Path, first: int) -> None:
+        """Write the rows from a rowid onwards at the end of a CSV file"""
+        with open(path, "rb+") as output:
+            if output.seek(0, SEEK_END):
+                output.seek(-1, SEEK_END)
+                if output.read(1) != b"\n":
+                    output.write(b"\r\n")
+        log.debug(f"Writing rows from {first} to {path}")
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT * FROM {table} WHERE rowid>=? ORDER BY rowid", (first,))
+        with open(path, "a", encoding="latin-1") as output:
+            writer(output).writerows(cursor)
+
+    def write_table(self, table: str, path: Path) -> None:
+        log.debug(f"Rewriting {path}")
+        with open(path, "w", encoding="latin-1") as output:
+            csvfile = writer(output)
+            csvfile.writerows(getattr(self, table).select(order="rowid"))
+
+    def begin(self) -> None:
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+
+    def read_csv(self, path: Path) -> None:
+        with self.summaries.paused(), self.checkpoints.paused():
+            for table in self.tables:
+                with open(path / f"{table}.csv", encoding="latin-1") as csvfile:
+                    getattr(self, table).insert(reader(csvfile))
+
+    def write_csv(self, path: Path) -> None:
+        for table in self.tables:
+            self.write_table(table, path / f"{table}.csv")
 
     def prompt(self) -> None:
-        lite_cli = LiteCli(sqlexecute=self.sqlexecute, liteclirc=home / "config")
+        from litecli.main import LiteCli, SQLExecute  # type: ignore
+
+        sqlexecute = SQLExecute(None)
+        sqlexecute.conn = self.connection
+        sqlexecute.dbname = self.database
+        sqlexecute.run = tripwire(sqlexecute.run, self)
+        lite_cli = LiteCli(sqlexecute=sqlexecute, liteclirc=home / "config")
         lite_cli.run_cli()
         if self.dirty and input("Save? ") == "y":
             self.save()
 
 
+def check_version(path: Path) -> None:
+    with open(path / "version") as version_file:
+        version = version_file.readline().strip()
+    if version != __version__:
+        raise RuntimeError(f"Running v{__version__} != database v{version}")
+
+
+def populated(database: Path) -> bool:
+    """Tell whether a database file exists and holds transactions"""
+    if not database.exists():
+        return False
+    connection = connect(f"{database.as_uri()}?mode=ro", uri=True)
+    try:
+        cursor = connection.execute(f"SELECT 1 FROM {Transactions.name} LIMIT 1")
+        return cursor.fetchone() is not None
+    except OperationalError:
+        return False
+    finally:
+        connection.close()
+
+
+@lru_cache(maxsize=64)
+def pattern(expression: str) -> Pattern[str]:
+    return compile(expression)
+
+
+def regexp(expression: str, value: Optional[str]) -> bool:
+    """Implementation of the REGEXP operator of SQLite"""
+    return value is not None and pattern(expression).search(value) is not None
+
+
+def csv_offset(path: Path, rows: int) -> int:
+    """Return the byte offset at which the given number of CSV rows end"""
+    offset = 0
+
+    def lines(csvfile: IO[str]) -> Iterator[str]:
+        nonlocal offset
+        for line in csvfile:
+            offset += len(line)
+            yield line
+
+    if rows:
+        with open(path, encoding="latin-1", newline="") as csvfile:
+            for count, _ in enumerate(reader(lines(csvfile)), 1):
+                if count == rows:
+                    break
+    return offset
+
+
 def tripwire(run: Callable[[str], "SQLResponse"], client: SQLite):
     @wraps(run)
     def wrapper(statement: str) -> "SQLResponse":
@@ -1,4 +1,9 @@
-from typing import Any, Sequence
+from itertools import chain, islice
+from os import environ
+from shlex import split
+from subprocess import PIPE, Popen
+from sys import stdout
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
 
 import colorful
 
@@ -9,14 +14,31 @@ class Table:
     def __init__(
         self,
         columns: Sequence[str],
-        data: Sequence[Sequence[Any]],
+        data: Iterable[Sequence[Any]],
         sorting=None,
+        widths: Optional[Sequence[int]] = None,
+        sample: int = 1000,
     ):
+        """Widths are taken from the first rows unless given upfront
+
+        Data can be any iterable, it is only consumed while rendering the rows,
+        except for the sampled rows. Cells wider than their column are cut.
+        """
         self.size = len(columns)
         self.columns = columns
-        self.data = data
+        self.templates = templates()
+        if widths is not None:
+            self.data = data
+            self.widths = list(widths)
+            return
+        if isinstance(data, Sequence):
+            self.data = data
+            head = data[:sample]
+        else:
+            head = list(islice(data, sample))
+            self.data = chain(head, data)
         self.widths = [len(column) for column in columns]
-        for row in data:
+        for row in head:
             for i in range(len(row)):
                 if isinstance(row[i], float):
                     value = f"{row[i]:.2f}"
@@ -48,18 +70,20 @@ class Table:
         columns = []
         for index in range(self.size):
             value = row[index]
+            width = self.widths[index]
             if isinstance(value, int):
-                cell = str(value).rjust(self.widths[index], fill)
-                value = colorful.cyan(cell)
+                prefix, suffix = self.templates["cyan"]
+                value = prefix + cut(str(value), width).rjust(width, fill) + suffix
             elif isinstance(value, float):
-                cell = f"{value:.2f}".rjust(self.widths[index], fill)
-                value = (colorful.green if value > 0 else colorful.red)(cell)
+                prefix, suffix = self.templates["green" if value > 0 else "red"]
+                value = prefix + cut(f"{value:.2f}", width).rjust(width, fill) + suffix
             else:
-                value = str(value).ljust(self.widths[index], fill)
+                value = cut(str(value), width).ljust(width, fill)
             columns.append(fill + value + fill)
         middle = middle.join(columns)
         if odd:
-            middle = colorful.on_black(middle)
+            prefix, suffix = self.templates["on_black"]
+            middle = prefix + middle + suffix
         return left + middle + right
 
     def header(self) -> str:
@@ -70,9 +94,59 @@ class Table:
         ]
         return "\n".join(lines)
 
+    def lines(self) -> Iterator[str]:
+        """Yield the formatted rows one by one, followed by the bottom border"""
+        for i, row in enumerate(self.data):
+            yield self._row_(row, odd=i % 2)
+        yield self._border_(3)
+
     def rows(self) -> str:
-        data = [self._row_(self.data[i], odd=i % 2) for i in range(len(self.data))]
-        return "\n".join(data + [self._border_(3)])
+        return "\n".join(self.lines())
+
+    def show(self, output: Optional[IO[str]] = None, chunk: int = 100) -> None:
+        """Write the table in chunks of rows, to a pager if stdout is a terminal"""
+        if output is not None:
+            write(self, output, chunk)
+            return
+        if not stdout.isatty():
+            write(self, stdout, chunk)
+            return
+        pager = Popen(split(environ.get("PAGER", "less -RS")), stdin=PIPE, text=True)
+        try:
+            write(self, pager.stdin, chunk)
+        except BrokenPipeError:
+            pass  # the pager was closed before the end of the table
+        finally:
+            try:
+                pager.stdin.close()
+            except BrokenPipeError:
+                pass
+            pager.wait()
+
+
+def write(table: Table, output: IO[str], chunk: int) -> None:
+    output.write(table.header() + "\n")
+    lines = table.lines()
+    while batch := list(islice(lines, chunk)):
+        output.write("\n".join(batch) + "\n")
+        output.flush()
+
+
+def cut(value: str, width: int) -> str:
+    """Shorten a cell to the width of its column, marking the cut"""
+    return value[: width - 1] + "…" if len(value) > width else value
+
+
+def templates() -> Dict[str, Tuple[str, str]]:
+    """Split the escape codes of each style around a placeholder
+
+    Formatting a cell then only needs two string concatenations.
+    """
+    styles = ["cyan", "green", "red", "on_black"]
+    return {
+        style: tuple(str(getattr(colorful, style)("\0")).split("\0", 1))
+        for style in styles
+    }
 
 
 colorful.use_16_ansi_colors()
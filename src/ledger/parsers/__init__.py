@@ -1,7 +1,22 @@
+from pathlib import Path
+from typing import Optional
+
 from . import d1822, ingdiba, revolut
 
-parsers = {
-    "ingdiba": ingdiba.read,
-    "1822direkt": d1822.read,
-    "revolut": revolut.read,
+modules = {
+    "ingdiba": ingdiba,
+    "1822direkt": d1822,
+    "revolut": revolut,
 }
+parsers = {name: module.read for name, module in modules.items()}
+signatures = {name: module.signature for name, module in modules.items()}
+
+
+def detect(filename: Path, size: int = 4096) -> Optional[str]:
+    """Return the name of the bank whose signature matches the file"""
+    with open(filename, "rb") as binary:
+        head = binary.read(size)
+    for name, signature in signatures.items():
+        if signature.match(head):
+            return name
+    return None
@@ -1,30 +1,33 @@
 from csv import reader
 from pathlib import Path
-from typing import List
+from typing import Iterator
 
 from ledger.database import Transaction
-from ledger.utils import str2date, str2float
+from ledger.parsers.signature import Signature
+from ledger.utils import reverse_records, str2date, str2float
 
+signature = Signature(
+    pattern=r"\d\d\.\d\d\.\d{4};\d\d\.\d\d\.\d{4};([^;]*;){3}-?[\d.]+,\d\d;[A-Z]{3};",
+    delimiter=";",
+    encoding="latin-1",
+)
 
-def read(filename: Path, account: str = "ingdiba") -> List[Transaction]:
-    transactions = []
-    with open(filename, encoding="latin-1") as csvfile:
-        data = reader(csvfile, delimiter=";")
-        for values in reversed(list(data)):
-            transactions.append(
-                Transaction(
-                    date=str2date(values[0]),
-                    valuta=str2date(values[1]),
-                    type=types[values[3]],
-                    subject=values[2].strip(),
-                    reference=values[4].strip(),
-                    saldo=str2float(values[5]),
-                    value=str2float(values[7]),
-                    account=account,
-                    # comment=values[4],
-                )
-            )
-    return transactions
+
+def read(filename: Path, account: str = "ingdiba") -> Iterator[Transaction]:
+    lines = reverse_records(filename, encoding=signature.encoding)
+    data = reader(lines, delimiter=signature.delimiter)
+    for values in data:
+        yield Transaction(
+            date=str2date(values[0]),
+            valuta=str2date(values[1]),
+            type=types[values[3]],
+            subject=values[2].strip(),
+            reference=values[4].strip(),
+            saldo=str2float(values[5]),
+            value=str2float(values[7]),
+            account=account,
+            # comment=values[4],
+        )
 
 
 types = {
@@ -1,9 +1,15 @@
 from csv import reader
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Iterator
 
 from ledger.database import Transaction
+from ledger.parsers.signature import Signature
+
+signature = Signature(
+    pattern="Type,Product,Started Date,Completed Date,Description,Amount,Fee,"
+    "Currency,State,Balance"
+)
 
 
 def str2datetime(value: str) -> datetime:
@@ -12,42 +18,37 @@ def str2datetime(value: str) -> datetime:
     return datetime.fromisoformat(value)
 
 
-def read(filename: Path, account: str = "revolut") -> List[Transaction]:
-    transactions = []
-    with open(filename) as csvfile:
-        data = list(reader(csvfile))
-        for values in data[1:]:
+def read(filename: Path, account: str = "revolut") -> Iterator[Transaction]:
+    with open(filename, encoding=signature.encoding) as csvfile:
+        data = reader(csvfile, delimiter=signature.delimiter)
+        next(data, None)
+        for values in data:
             started = str2datetime(values[2])
             completed = str2datetime(values[2])
             fee = -float(values[6])
-            transactions.append(
-                Transaction(
+            yield Transaction(
+                date=started.date(),
+                valuta=completed.date(),
+                time=str(started.time()),
+                type=types[values[0]],
+                subject=values[4],
+                reference="",
+                value=float(values[5]),
+                saldo=round(float(values[9]) - fee, 2),
+                account=account,
+            )
+            if fee:
+                yield Transaction(
                     date=started.date(),
                     valuta=completed.date(),
                     time=str(started.time()),
-                    type=types[values[0]],
+                    type="fee",
                     subject=values[4],
                     reference="",
-                    value=float(values[5]),
-                    saldo=round(float(values[9]) - fee, 2),
+                    value=fee,
+                    saldo=float(values[9]),
                     account=account,
                 )
-            )
-            if fee:
-                transactions.append(
-                    Transaction(
-                        date=started.date(),
-                        valuta=completed.date(),
-                        time=str(started.time()),
-                        type="fee",
-                        subject=values[4],
-                        reference="",
-                        value=fee,
-                        saldo=float(values[9]),
-                        account=account,
-                    )
-                )
-    return transactions
 
 
 types = {
@@ -0,0 +1,22 @@
+from re import compile
+from typing import NamedTuple
+
+
+class Signature(NamedTuple):
+    """Format of a bank extract, recognizable from the start of the file
+
+    The pattern is matched against the first line, so checking a file only
+    requires reading its first few kilobytes.
+    """
+
+    pattern: str
+    delimiter: str = ","
+    encoding: str = "utf-8"
+
+    def match(self, head: bytes) -> bool:
+        line = head.split(b"\n", 1)[0].rstrip(b"\r")
+        try:
+            text = line.decode(self.encoding)
+        except UnicodeDecodeError:
+            return False
+        return compile(self.pattern).match(text) is not None
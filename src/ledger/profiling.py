@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from json import dumps
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterator
+
+
+class Span:
+    """Accumulated duration and row count of a named step"""
+
+    __slots__ = ("calls", "seconds", "rows")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def asdict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "rows": self.rows,
+            "rows/s": self.rate,
+        }
+
+
+spans: Dict[str, Span] = {}
+
+
+@contextmanager
+def span(name: str, rows: int = 0) -> Iterator[Span]:
+    """Time a block, adding to the totals of previous blocks with the same name
+
+    Rows processed by the block can be passed upfront or added to the yielded
+    span once they are known.
+    """
+    record = spans.setdefault(name, Span())
+    record.rows += rows
+    start = perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds += perf_counter() - start
+        record.calls += 1
+
+
+def report() -> str:
+    lines = [f"{'span':<12} {'calls':>6} {'seconds':>9} {'rows':>9} {'rows/s':>10}"]
+    for name, record in spans.items():
+        lines.append(
+            f"{name:<12} {record.calls:>6} {record.seconds:>9.4f} "
+            f"{record.rows:>9} {record.rate:>10.0f}"
+        )
+    return "\n".join(lines)
+
+
+def dump(path: Path) -> None:
+    data = {name: record.asdict() for name, record in spans.items()}
+    path.write_text(dumps(data, indent=2) + "\n")
+
+
+def reset() -> None:
+    spans.clear()
@@ -1,12 +1,30 @@
 from datetime import date
 from enum import Enum
 from functools import partial
+from operator import eq, ge, gt, le, lt, ne
 from re import compile
-from typing import Any, Callable, List, Type, TypeVar, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from .database import Transaction
 from .utils import isodate
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
 T = TypeVar("T")
 
 
@@ -41,19 +59,109 @@ class Query:
     def __call__(self, transaction: Transaction) -> bool:
         return bool(self.check(getattr(transaction, self.key)))
 
+    def sql(self) -> Tuple[str, List[Any]]:
+        """Translate the query into a parameterized SQL condition"""
+        value = self.value
+        if isinstance(value, date):
+            value = value.isoformat()
+        operator = sql_operators.get(self.operator, self.operator.value)
+        return f'"{self.key}" {operator} ?', [value]
+
+    def mask(self, column: "numpy.ndarray") -> "numpy.ndarray":
+        """Evaluate the query over a whole column at once"""
+        if self.operator is Operator.re:
+            return numpy.fromiter(
+                (value is not None and bool(self.check(value)) for value in column),
+                dtype=bool,
+                count=len(column),
+            )
+        value = self.value
+        if isinstance(value, date):
+            value = numpy.datetime64(value, "D")
+        return comparisons[self.operator](column, value)
+
+
+class Columns:
+    """Column-oriented view of a list of transactions backed by NumPy arrays
+
+    Arrays are built on first access, so only the queried columns are copied.
+    """
+
+    def __init__(self, data: Sequence[Transaction]):
+        if numpy is None:
+            raise ImportError("The columnar mode requires NumPy")
+        self.rows = data
+        self.arrays: Dict[str, numpy.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, key: str) -> "numpy.ndarray":
+        if key not in self.arrays:
+            datatype = Transaction.__annotations__[key]
+            stored = getattr(self.rows, "columns", {}).get(key)
+            if isinstance(stored, memoryview):
+                # Copied, as views on the mapped file would prevent closing it
+                self.arrays[key] = numpy.array(stored, dtype=float)
+                return self.arrays[key]
+            if hasattr(stored, "ordinals"):
+                ordinals = numpy.frombuffer(stored.ordinals, dtype=numpy.int32)
+                days = (ordinals - date(1970, 1, 1).toordinal()).astype("datetime64[D]")
+                days[ordinals == 0] = numpy.datetime64("NaT")
+                self.arrays[key] = days
+                return self.arrays[key]
+            if stored is not None:
+                values = list(stored)
+            else:
+                values = [getattr(row, key) for row in self.rows]
+            if datatype is float:
+                self.arrays[key] = numpy.array(values, dtype=float)
+            elif datatype in (date, Optional[date]):
+                self.arrays[key] = numpy.array(values, dtype="datetime64[D]")
+            else:
+                self.arrays[key] = numpy.array(values, dtype=object)
+        return self.arrays[key]
+
 
 class Filter:
-    def __init__(self, data: List[Transaction]):
+    def __init__(self, data: Sequence[Transaction], columnar: bool = False):
         self.queries: List[Union[Query, Callable[[Transaction], bool]]] = []
-        self.data = [data]
+        self.columns: Optional[Columns] = None
+        self.data: List[Any] = [data]
+        if columnar:
+            self.columns = Columns(data)
+            self.data = [numpy.arange(len(data))]
 
     def __repr__(self) -> str:
         queries = "] and [".join([str(query) for query in self.queries])
         return f"Filter [{queries}]"
 
+    @property
+    def result(self) -> Sequence[Transaction]:
+        if self.columns is None:
+            return self.data[-1]
+        return [self.columns.rows[index] for index in self.data[-1]]
+
     def add(self, query: Union[Query, Callable[[Transaction], bool]]) -> None:
         self.queries.append(query)
-        self.data.append([row for row in self.data[-1] if query(row)])
+        if self.columns is None:
+            self.data.append([row for row in self.data[-1] if query(row)])
+            return
+        indexes = self.data[-1]
+        if isinstance(query, Query):
+            mask = query.mask(self.columns[query.key][indexes])
+        else:
+            rows = self.columns.rows
+            mask = numpy.fromiter(
+                (query(rows[index]) for index in indexes),
+                dtype=bool,
+                count=len(indexes),
+            )
+        self.data.append(indexes[mask])
+
+    def where(self) -> Tuple[str, List[Any]]:
+        """Combine the added queries into a WHERE clause"""
+        return where(self.queries)
 
     def pop(self) -> None:
         self.queries.pop()
@@ -64,6 +172,40 @@ class Filter:
         self.data = self.data[:1]
 
 
+comparisons = {
+    Operator.gt: gt,
+    Operator.ge: ge,
+    Operator.lt: lt,
+    Operator.le: le,
+    Operator.ne: ne,
+    Operator.eq: eq,
+}
+
+
+sql_operators = {
+    Operator.eq: "=",
+    Operator.re: "REGEXP",
+}
+
+
+def where(
+    queries: Iterable[Union[Query, Callable[[Transaction], bool]]],
+) -> Tuple[str, List[Any]]:
+    """Combine queries into a WHERE clause to be run by Table.select
+
+    Only the rows matching the queries are then loaded from the database.
+    """
+    conditions = []
+    parameters: List[Any] = []
+    for query in queries:
+        if not isinstance(query, Query):
+            raise TypeError(f"{query} cannot be translated into SQL")
+        condition, values = query.sql()
+        conditions.append(condition)
+        parameters += values
+    return " AND ".join(conditions), parameters
+
+
 def converter(value: str, datatype: Type[T]) -> T:
     if datatype is float:
         return float(value)
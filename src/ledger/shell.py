@@ -1,3 +1,5 @@
 from ledger.database import SQLite
+from ledger.snapshot import current
 
 db = SQLite()
+transactions = current(db)
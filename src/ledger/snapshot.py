@@ -0,0 +1,207 @@
+from array import array
+from datetime import date as day
+from json import dumps, loads
+from logging import getLogger
+from mmap import ACCESS_READ, mmap
+from os import replace
+from pathlib import Path
+from struct import pack, unpack_from
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union, overload
+
+from . import __version__
+from .database import SQLite, Transaction
+from .utils import isodate
+
+MAGIC = b"LEDGERS1"
+
+
+class Dates(Sequence[Optional[Any]]):
+    """Dates stored as ordinals, zero standing for a missing date"""
+
+    def __init__(self, ordinals: memoryview):
+        self.ordinals = ordinals
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def __getitem__(self, index):
+        ordinal = self.ordinals[index]
+        return day.fromordinal(ordinal) if ordinal else None
+
+
+class Strings(Sequence[str]):
+    """Strings stored as consecutive UTF-8 bytes delimited by offsets"""
+
+    def __init__(self, offsets: memoryview, heap: memoryview):
+        self.offsets = offsets
+        self.heap = heap
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return str(self.heap[self.offsets[index] : self.offsets[index + 1]], "utf-8")
+
+
+class Snapshot(Sequence[Transaction]):
+    """Read-only transactions backed by a memory-mapped columnar file
+
+    Columns are views over the mapped file, so opening a snapshot only reads
+    its header and the pages of the file are shared between processes.
+    Transactions are created when accessed.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as snapshot:
+            self.map = mmap(snapshot.fileno(), 0, access=ACCESS_READ)
+        view = memoryview(self.map)
+        self.views = [view]
+        if bytes(view[: len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        (size,) = unpack_from("<I", view, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = loads(bytes(view[start : start + size]))
+        start = align(start + size)
+        self.size: int = self.header["rows"]
+        self.columns: Dict[str, Sequence[Any]] = {}
+        for name, kind, offset, length in self.header["columns"]:
+            offset += start
+            data = self.cast(view[offset : offset + length], kind)
+            if kind == "i":
+                self.columns[name] = Dates(data)
+            elif kind == "Q":
+                heap = view[offset + length : offset + length + data[-1]]
+                self.views.append(heap)
+                self.columns[name] = Strings(data, heap)
+            else:
+                self.columns[name] = data
+
+    def cast(self, view: memoryview, kind: str) -> memoryview:
+        self.views.append(view)
+        self.views.append(view.cast(kind))
+        return self.views[-1]
+
+    def __len__(self) -> int:
+        return self.size
+
+    @overload
+    def __getitem__(self, index: int) -> Transaction: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Transaction]: ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[Transaction, List[Transaction]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("snapshot index out of range")
+        return Transaction(*[column[index] for column in self.columns.values()])
+
+    def close(self) -> None:
+        for view in reversed(self.views):
+            view.release()
+        self.map.close()
+
+
+def kinds() -> Dict[str, str]:
+    """Return the array type code used to store each column of transactions"""
+    codes = {}
+    for column, attrs in Transaction.__dataclass_fields__.items():
+        if str(attrs.type).startswith("typing.Optional"):
+            kind = attrs.type.__args__[0]
+        else:
+            kind = attrs.type
+        codes[column] = {day: "i", float: "d"}.get(kind, "Q")
+    return codes
+
+
+def stamp(source: Path) -> List[int]:
+    stat = source.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def write(path: Path, rows: Iterable[Sequence[Any]], source: Path) -> None:
+    """Write transaction rows in the order of Transaction's fields
+
+    The file is replaced atomically and records the state of the source it
+    was built from, so that it can be discarded once the source changes.
+    """
+    codes = kinds()
+    columns: List[array] = [array(code) for code in codes.values()]
+    heaps = [bytearray() for _ in codes]
+    for column, code in zip(columns, codes.values()):
+        if code == "Q":
+            column.append(0)
+    count = 0
+    for row in rows:
+        count += 1
+        for column, heap, code, value in zip(columns, heaps, codes.values(), row):
+            if code == "d":
+                column.append(value)
+            elif code == "i":
+                column.append(isodate(value).toordinal() if value else 0)
+            else:
+                heap += (value or "").encode()
+                column.append(len(heap))
+    header = {"version": __version__, "rows": count, "source": stamp(source)}
+    # Offsets are relative to the data section, which follows the header
+    layout, position = [], 0
+    for name, column, heap in zip(codes, columns, heaps):
+        size = len(column) * column.itemsize
+        layout.append([name, codes[name], position, size])
+        position = align(position + size + len(heap))
+    header["columns"] = layout
+    encoded = dumps(header).encode()
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "wb") as snapshot:
+        snapshot.write(MAGIC + pack("<I", len(encoded)) + encoded)
+        start = align(snapshot.tell())
+        for column, heap, (_, _, offset, _) in zip(columns, heaps, layout):
+            snapshot.write(bytes(start + offset - snapshot.tell()))
+            column.tofile(snapshot)
+            snapshot.write(heap)
+    replace(temporary, path)
+
+
+def load(path: Path, source: Path) -> Optional[Snapshot]:
+    """Open a snapshot unless it is missing or older than its source"""
+    if not path.exists() or not source.exists():
+        return None
+    snapshot = Snapshot(path)
+    if (
+        snapshot.header["version"] != __version__
+        or snapshot.header["source"] != stamp(source)
+        or [column[0] for column in snapshot.header["columns"]] != list(kinds())
+    ):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def current(db: SQLite) -> Snapshot:
+    """Open the snapshot of a database, rebuilding it first when outdated
+
+    Saving does not write snapshots, so they are rebuilt on demand from a
+    separately loaded copy of the database, which leaves the given one as is.
+    """
+    snapshot = load(db.snapshot, db.source)
+    if snapshot is None:
+        log.info(f"Rebuilding {db.snapshot}")
+        database = Path(db.database) if db.persistent else None
+        copy = SQLite(db.path, db.persistent, database)
+        copy.load()
+        copy.write_snapshot()
+        copy.connection.close()
+        snapshot = Snapshot(db.snapshot)
+    return snapshot
+
+
+def align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+log = getLogger(__name__)
@@ -1,13 +1,92 @@
-from datetime import date, datetime
+from datetime import date, datetime, time
+from functools import lru_cache
+from io import SEEK_END
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, TypeVar
 
+T = TypeVar("T")
 
+
+@lru_cache(maxsize=8192)
 def isodate(string: str) -> date:
-    return datetime.strptime(string, "%Y-%m-%d").date()
+    """Parse a YYYY-MM-DD date, sharing the result between repeated values"""
+    return date.fromisoformat(string)
 
 
+@lru_cache(maxsize=8192)
 def str2date(value: str) -> date:
-    return datetime.strptime(value, "%d.%m.%Y").date()
+    """Parse a DD.MM.YYYY date, sharing the result between repeated values"""
+    if len(value) != 10 or value[2] != "." or value[5] != ".":
+        raise ValueError(f"Invalid date: {value}")
+    return date(int(value[6:]), int(value[3:5]), int(value[:2]))
+
+
+def str2datetime(value: str) -> datetime:
+    """Parse a DD.MM.YYYY HH:MM timestamp"""
+    if len(value) != 16 or value[10] != " " or value[13] != ":":
+        raise ValueError(f"Invalid timestamp: {value}")
+    return datetime.combine(
+        str2date(value[:10]), time(int(value[11:13]), int(value[14:]))
+    )
 
 
 def str2float(value: str) -> float:
     return float(value.replace(".", "").replace(",", "."))
+
+
+def reverse_lines(
+    path: Path, encoding: str = "utf-8", size: int = 1 << 16
+) -> Iterator[str]:
+    """Yield the lines of a file from the last to the first, reading by blocks"""
+    with open(path, "rb") as binary:
+        position = end = binary.seek(0, SEEK_END)
+        remainder = b""
+        trailing = True
+        while position:
+            step = min(size, position)
+            position -= step
+            binary.seek(position)
+            lines = (binary.read(step) + remainder).split(b"\n")
+            remainder = lines.pop(0)
+            if trailing and lines:
+                trailing = False
+                if not lines[-1]:
+                    lines.pop()
+            for line in reversed(lines):
+                yield line.decode(encoding)
+        if end:
+            yield remainder.decode(encoding)
+
+
+def reverse_records(
+    path: Path, encoding: str = "utf-8", size: int = 1 << 16
+) -> Iterator[str]:
+    """Yield the lines of a CSV file with its records from the last to the first
+
+    Lines of a record spanning several lines, within a quoted field, are kept
+    in order. A line starting inside a quoted field leaves an odd number of
+    quotes until the end of its record, so lines are grouped until the count
+    is even again.
+    """
+    lines: List[str] = []
+    quotes = 0
+    for line in reverse_lines(path, encoding, size):
+        quotes += line.count('"')
+        if not quotes % 2 and not lines:
+            yield line
+            continue
+        lines.append(line)
+        if not quotes % 2:
+            for previous in reversed(lines[1:]):
+                yield previous.rstrip("\r") + "\n"
+            yield lines[0]
+            lines.clear()
+            quotes = 0
+    yield from reversed(lines)
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,21 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from ledger.parsers import detect
+
+samples = {
+    "1822direkt": "0123456789;02.10.2015 12:34;02.10.2015;EUR;-3,20;Lastschrift\n",
+    "revolut": "Type,Product,Started Date,Completed Date,Description,Amount,Fee,"
+    "Currency,State,Balance\n",
+}
+
+
+def test_detect():
+    assert detect(Path(__file__).parent / "ingdiba.csv") == "ingdiba"
+    with TemporaryDirectory() as tmp_dir:
+        for bank, sample in samples.items():
+            path = Path(tmp_dir) / f"{bank}.csv"
+            path.write_text(sample, encoding="latin-1")
+            assert detect(path) == bank
+        path.write_text("Date,Amount\n")
+        assert detect(path) is None
@@ -1,9 +1,21 @@
 from pathlib import Path
+from tempfile import TemporaryDirectory
 
 from ledger.parsers import ingdiba
 
 
 def test_parser(parsed_transactions):
     csv_file = Path(__file__).parent / "ingdiba.csv"
-    transactions = ingdiba.read(csv_file)
+    transactions = list(ingdiba.read(csv_file))
     assert transactions == parsed_transactions
+
+
+def test_multiline_field(parsed_transactions):
+    lines = (Path(__file__).parent / "ingdiba.csv").read_text().splitlines()
+    lines[1] = lines[1].replace("Payback", '"Pay\nback"')
+    with TemporaryDirectory() as tmp_dir:
+        csv_file = Path(tmp_dir) / "ingdiba.csv"
+        csv_file.write_text("\n".join(lines) + "\n", encoding="latin-1")
+        transactions = list(ingdiba.read(csv_file))
+    assert transactions == parsed_transactions
+    assert transactions[-2].reference == "Pay\nback"
@@ -0,0 +1,31 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmarks import extracts, write_extract, write_ledger
+from ledger.database import SQLite
+from ledger.parsers import detect, parsers
+
+
+def test_extracts():
+    with TemporaryDirectory() as tmp_dir:
+        for bank in extracts:
+            path = Path(tmp_dir) / f"{bank}.csv"
+            write_extract(path, bank, 50)
+            assert detect(path) == bank
+            transactions = list(parsers[bank](path, bank))
+            assert len(transactions) == 50
+            assert transactions[0].date <= transactions[-1].date
+
+
+def test_ledger():
+    with TemporaryDirectory() as tmp_dir:
+        write_ledger(Path(tmp_dir), 90)
+        db = SQLite(Path(tmp_dir))
+        db.load()
+        assert db.transactions.count() == 90
+        assert db.transactions.distinct("account") == {
+            "account0",
+            "account1",
+            "account2",
+        }
+        db.transactions.check()
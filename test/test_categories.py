@@ -1,7 +1,10 @@
 from pytest import fixture
 from pathlib import Path
+from shutil import copy
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
-from ledger.categories import Category, Categorizer
+from ledger.categories import Category, Categorizer, Matcher
 
 
 @fixture(scope="module")
@@ -22,3 +25,40 @@ def test_apply(categorizer, parsed_transactions):
     assert parsed_transactions[2].category == "work"
     assert parsed_transactions[3].category == ""
     assert parsed_transactions[4].category == "lodging:hotels"
+
+
+def test_matcher():
+    matcher = Matcher(
+        [
+            Category("transport", ["DB Vertrieb", "BVG"]),
+            Category("groceries", ["REWE", "DB"]),
+            Category("travel", ["DB Vertrieb GmbH", "Hotel"]),
+        ]
+    )
+    assert matcher("DB Vertrieb GmbH") == ["transport", "groceries", "travel"]
+    assert matcher("REWE Hotel") == ["groceries", "travel"]
+    assert matcher("DB") == ["groceries"]
+    assert matcher("DB Vertrieb Gm") == ["transport", "groceries"]
+    assert matcher("Lidl") == []
+
+
+def test_conflicts(categorizer, parsed_transactions, caplog):
+    parsed_transactions[4].category = "holidays"
+    categorizer(parsed_transactions[4:5])
+    assert parsed_transactions[4].category == "holidays"
+    assert "not lodging:hotels" in caplog.text
+
+
+def test_cache(categorizer):
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "categories.yaml"
+        copy(Path(__file__).parent / "data" / "categories.yaml", path)
+        assert Categorizer(path, cache=True).categories == categorizer.categories
+        assert path.with_suffix(".cache").exists()
+        with patch("ledger.categories.read_yaml", side_effect=AssertionError):
+            assert Categorizer(path, cache=True).categories == categorizer.categories
+        with open(path, "a") as yml:
+            yml.write("travel:\n  - DB Vertrieb\n")
+        assert Categorizer(path, cache=True).categories[-1] == Category(
+            "travel", ["DB Vertrieb"]
+        )
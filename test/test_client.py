@@ -4,7 +4,10 @@ from typing import List
 from tempfile import TemporaryDirectory
 from distutils.dir_util import copy_tree
 
-from ledger.client import parse
+from pytest import raises
+
+from ledger import __version__
+from ledger.client import find, parse, parse_many, sql_import
 from ledger.database import SQLite, Transaction
 from ledger.categories import Categorizer
 
@@ -21,8 +24,68 @@ def test_parse(
             mocks["SQLite"].return_value = db
             mocks["Categorizer"] = Categorizer(Path(tmp_dir) / "categories.yaml")
             parse(test_dir / "parsers/ingdiba.csv", "ingdiba", "ingdiba")
+            db = SQLite(Path(tmp_dir))
+            mocks["SQLite"].return_value = db
+            parse(test_dir / "parsers/ingdiba.csv", "ingdiba", "ingdiba")
             all_transactions = stored_transactions + parsed_transactions[2:]
             assert db.transactions.get_many() == all_transactions
             assert sum(1 for line in open(Path(tmp_dir) / "transactions.csv")) == len(
                 all_transactions
             )
+
+
+def test_parse_many(
+    stored_transactions: List[Transaction],
+    parsed_transactions: List[Transaction],
+):
+    test_dir = Path(__file__).parent
+    lines = (test_dir / "parsers/ingdiba.csv").read_text().splitlines(keepends=True)
+    with TemporaryDirectory() as tmp_dir:
+        extracts = Path(tmp_dir) / "extracts"
+        extracts.mkdir()
+        (extracts / "2015-10.csv").write_text("".join(lines[:4]))
+        (extracts / "2015-09.csv").write_text("".join(lines[2:]))
+        jobs = find([extracts], {"2015-*.csv": "ingdiba"})
+        assert jobs == [
+            (extracts / "2015-09.csv", "ingdiba", "ingdiba"),
+            (extracts / "2015-10.csv", "ingdiba", "ingdiba"),
+        ]
+        with patch.multiple("ledger.client", SQLite=Mock, Categorizer=Mock) as mocks:
+            copy_tree(str(test_dir / "data"), tmp_dir)
+            db = SQLite(Path(tmp_dir))
+            mocks["SQLite"].return_value = db
+            parse_many(jobs[::-1])
+            assert db.transactions.get_many() == (
+                stored_transactions + parsed_transactions[2:]
+            )
+
+
+def test_sql_import(stored_transactions: List[Transaction]):
+    data = Path(__file__).parent / "data"
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        (path / "version").write_text("0.0.1")
+        with patch("ledger.client.home", path):
+            with raises(RuntimeError):
+                sql_import(data)
+            assert list(path.iterdir()) == [path / "version"]
+            (path / "version").write_text(__version__)
+            (path / "ledger.db").touch()
+            assert not SQLite(path).persistent
+            sql_import(data)
+            assert not (path / "ledger.tmp").exists()
+            db = SQLite(path)
+            assert db.persistent
+            assert db.transactions.get_many() == stored_transactions
+            with raises(AssertionError):
+                sql_import(data)
+            db.load()
+            db.connection.execute("DELETE FROM transactions WHERE rowid=1")
+            db.save()
+            with patch.multiple(
+                "ledger.client", SQLite=Mock, Categorizer=Mock
+            ) as mocks:
+                mocks["SQLite"].return_value = SQLite(path)
+                parse(Path(__file__).parent / "parsers/ingdiba.csv", "ingdiba")
+            db = SQLite(path)
+            assert db.transactions.count() == len(stored_transactions) + 4
@@ -1,16 +1,20 @@
 from dataclasses import astuple, dataclass, field
+from distutils.dir_util import copy_tree
 from datetime import date
 from filecmp import dircmp
 from pathlib import Path
+from pickle import dumps, loads
 from random import choice
 from sqlite3 import IntegrityError
 from tempfile import TemporaryDirectory
 from typing import List, Optional
+from unittest.mock import patch
 
 from litecli.main import SQLExecute
 from pytest import raises
 
-from ledger.database import SQLite, Table, Tag, Transaction
+from ledger import __version__
+from ledger.database import Derived, SQLite, Table, Tag, Transaction
 
 
 @dataclass
@@ -41,6 +45,8 @@ class Items(Table):
 
 def test_table_class():
     assert Users.columns == ["email", "age", "score", "birthday"]
+    with raises(TypeError):
+        Derived(SQLExecute(":memory:").conn)
 
 
 def test_create_table():
@@ -69,6 +75,23 @@ def test_create_table():
     assert items.name == "items"
 
 
+def test_indexes(db: SQLite):
+    cursor = db.connection.cursor()
+    cursor.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='index' AND sql NOT NULL"
+    )
+    assert cursor.fetchall() == [
+        (
+            "transactions_account",
+            'CREATE INDEX transactions_account ON transactions ("account")',
+        ),
+        (
+            "transactions_category",
+            'CREATE INDEX transactions_category ON transactions ("category")',
+        ),
+    ]
+
+
 def test_transaction_schema():
     transaction = Transaction(
         date="2020-02-03",
@@ -88,6 +111,12 @@ def test_transaction_schema():
         "saldo": 321,
         "account": "bank",
     }
+    assert transaction.key == (date(2020, 2, 3), 123, 321, "bank")
+    duplicate = Transaction("2020-02-03", "fee", "", "", 123.0, 321.0, "bank")
+    assert duplicate == transaction
+    assert len({transaction, duplicate}) == 1
+    assert not hasattr(transaction, "__dict__")
+    assert loads(dumps(transaction)).key == transaction.key
 
 
 def test_add_many():
@@ -120,6 +149,22 @@ def test_categorize(db: SQLite, stored_transactions: List[Transaction]):
     assert db.transactions.get_one(category="test:category") == stored_transactions[0]
 
 
+def test_categorize_many(db: SQLite, parsed_transactions: List[Transaction]):
+    db.transactions.add_many(parsed_transactions[2:])
+    uncategorized = db.transactions.uncategorized()
+    assert sorted(rowid for rowid, _ in uncategorized) == [6, 7, 8, 9, 10]
+    assert uncategorized[0] == (10, parsed_transactions[-1])
+    assert uncategorized[-1] == (6, parsed_transactions[2])
+    db.transactions.categorize_many([(6, "work"), (8, "lodging:hotels")])
+    assert db.transactions.get_one(rowid=8).category == "lodging:hotels"
+    assert len(db.transactions.uncategorized()) == 3
+    with raises(ZeroDivisionError):
+        with db.transactions.atomic():
+            db.transactions.categorize_many([(7, "travel")])
+            1 / 0
+    assert db.transactions.get_one(rowid=7).category == ""
+
+
 def test_duplicates(
     db: SQLite, stored_transactions: List[Transaction], stored_tags: List[Tag]
 ):
@@ -139,6 +184,18 @@ def test_select(db: SQLite, stored_tags: List[Tag]):
     assert db.tags.select(rowid=1) == rows[:1]
 
 
+def test_select_parameters(db: SQLite, transaction: Transaction):
+    transaction.subject = "Lupo's Lopez"
+    db.transactions.add_one(transaction)
+    assert db.transactions.get_one(subject="Lupo's Lopez") == transaction
+    assert db.transactions.select("rowid", date="2015-06-05", value=-6.96) == [(3,)]
+    assert db.transactions.select("rowid", date="2015-06-05", value=0) == []
+    assert len(db.transactions.statements) == 2
+    for value in range(3):
+        db.transactions.select("rowid", where=f"value > {value}")
+    assert len(db.transactions.statements) == 2
+
+
 def test_get_one(db: SQLite, stored_transactions: List[Transaction]):
     assert db.transactions.get_one() == stored_transactions[0]
     assert db.transactions.get_one(rowid=3) == stored_transactions[2]
@@ -153,8 +210,87 @@ def test_get_many(db: SQLite, stored_transactions: List[Transaction]):
     )
 
 
-def test_check_transactions(db: SQLite):
-    db.transactions.check()
+def test_check_transactions(db: SQLite, parsed_transactions: List[Transaction]):
+    assert db.transactions.check() == 5
+    assert db.transactions.check("ingdiba") == 5
+    db.connection.execute("UPDATE transactions SET saldo=0 WHERE rowid=2")
+    with raises(AssertionError) as error:
+        db.transactions.check()
+    assert str(error.value) == "Error: 4776.06 + -50.0 != 0.0"
+    db.connection.execute("UPDATE transactions SET saldo=4726.06 WHERE rowid=2")
+    db.transactions.add_many(parsed_transactions[2:])
+    assert db.transactions.check(since=5) == 10
+    db.connection.execute("UPDATE transactions SET saldo=0 WHERE rowid=1")
+    assert db.transactions.check(since=5) == 10
+    db.connection.execute("UPDATE transactions SET saldo=4669 WHERE rowid=5")
+    with raises(AssertionError):
+        db.transactions.check(since=5)
+
+
+def test_summaries(db: SQLite, parsed_transactions: List[Transaction]):
+    def aggregate():
+        return db.transactions.fetch(
+            "SELECT account, substr(date, 1, 7), category, ROUND(SUM(value), 2), "
+            "COUNT(rowid) FROM transactions GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+        )
+
+    def summaries():
+        return db.summaries.fetch("SELECT * FROM summaries ORDER BY 1, 2, 3")
+
+    assert summaries() == aggregate()
+    db.transactions.add_many(parsed_transactions[2:])
+    assert summaries() == aggregate()
+    db.transactions.categorize_many([(6, "work"), (8, "work")])
+    db.transactions.categorize(parsed_transactions[-1], "lodging:hotels")
+    assert summaries() == aggregate()
+    db.connection.execute("DELETE FROM transactions WHERE rowid>8")
+    assert summaries() == aggregate()
+    db.connection.execute("DELETE FROM summaries")
+    db.summaries.rebuild()
+    assert summaries() == aggregate()
+    db = SQLite(db.path)
+    db.load()
+    assert db.summaries.count() == 4
+    assert summaries() == aggregate()
+
+
+def test_checkpoints(
+    db: SQLite, parsed_transactions: List[Transaction], transaction: Transaction
+):
+    db.transactions.add_many(parsed_transactions[2:] + [transaction])
+    assert db.checkpoints.select(order="month") == [
+        ("ingdiba", "2015-06", 4669.19, 5),
+        ("ingdiba", "2015-09", 8645.1, 6),
+        ("ingdiba", "2015-10", 8237.1, 10),
+        ("cash", "2020-03", 12093.67, 11),
+    ]
+    balance = db.checkpoints.balance
+    assert balance("ingdiba", date(2015, 6, 1)) == 0.0
+    assert balance("ingdiba", date(2015, 6, 2)) == 4726.06
+    assert balance("ingdiba", date(2015, 7, 15)) == 4669.19
+    assert balance("ingdiba", date(2015, 9, 30)) == 8645.1
+    assert balance("ingdiba", date(2015, 10, 1)) == 8240.3
+    assert db.checkpoints.net_worth(date(2020, 3, 14)) == 20330.77
+    series = db.checkpoints.series(date(2015, 9, 27), date(2015, 10, 2))
+    assert [total for _, total in series] == [
+        4669.19,
+        8645.1,
+        8645.1,
+        8645.1,
+        8240.3,
+        8237.1,
+    ]
+    assert series == [(day, db.checkpoints.net_worth(day)) for day, _ in series]
+    db.connection.execute("DELETE FROM transactions WHERE rowid=10")
+    assert db.checkpoints.get_one(month="2015-10").saldo == 8240.3
+    db.connection.execute("UPDATE transactions SET saldo=1 WHERE rowid=9")
+    assert db.checkpoints.get_one(month="2015-10").saldo == 1
+    db.connection.execute("UPDATE transactions SET date='2015-07-01' WHERE rowid=5")
+    db.connection.execute("UPDATE transactions SET account='cash' WHERE rowid=7")
+    checkpoints = sorted(db.checkpoints.select())
+    db.checkpoints.rebuild()
+    assert checkpoints == sorted(db.checkpoints.select())
+    assert ("ingdiba", "2015-07", 4669.19, 5) in checkpoints
 
 
 def test_load(stored_transactions: List[Transaction], stored_tags: List[Tag]):
@@ -171,3 +307,63 @@ def test_save(db: SQLite):
         db.path = Path(tmp_dir)
         db.save()
         dircmp(str(path), tmp_dir)
+
+
+def test_persistent(stored_transactions: List[Transaction], stored_tags: List[Tag]):
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        (path / "version").write_text(__version__)
+        db = SQLite(path, persistent=True)
+        db.load()
+        db.read_csv(Path(__file__).parent / "data")
+        db.save()
+        db = SQLite(path)
+        assert db.persistent
+        db.load()
+        assert db.transactions.get_many() == stored_transactions
+        assert db.tags.get_many() == stored_tags
+        db.transactions.categorize(stored_transactions[0], "test:category")
+        db = SQLite(path)
+        db.load()
+        assert db.transactions.get_one(category="test:category") is None
+        db.write_csv(path)
+        assert (path / "transactions.csv").read_text().count("\n") == len(
+            stored_transactions
+        )
+
+
+def test_incremental_save(
+    stored_transactions: List[Transaction], transaction: Transaction
+):
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        copy_tree(str(Path(__file__).parent / "data"), tmp_dir)
+        db = SQLite(path)
+        db.load()
+        db.transactions.add_one(transaction)
+        with patch("ledger.database.csv_offset") as csv_offset:
+            db.save()
+        csv_offset.assert_not_called()
+        db.transactions.categorize(stored_transactions[3], "test:category")
+        db.save()
+        expected = db.transactions.get_many()
+        db = SQLite(path)
+        db.load()
+        assert db.transactions.get_many() == expected
+        assert db.transactions.get_one(rowid=4).category == "test:category"
+        db.connection.execute("DELETE FROM transactions WHERE rowid=6")
+        db.save()
+        assert (path / "transactions.csv").read_text().count("\n") == len(
+            stored_transactions
+        )
+        db.connection.execute("DELETE FROM transactions WHERE rowid=5")
+        db.connection.execute(
+            "INSERT INTO transactions SELECT date, type, 'REPLACED', reference, "
+            "value, saldo + 1, account, valuta, time, category, location, comment "
+            "FROM transactions WHERE rowid=4"
+        )
+        db.save()
+        db = SQLite(path)
+        db.load()
+        assert db.transactions.count() == len(stored_transactions)
+        assert db.transactions.get_one(rowid=5).subject == "REPLACED"
@@ -0,0 +1,99 @@
+from csv import reader, writer
+from dataclasses import astuple
+from pathlib import Path
+from sqlite3 import OperationalError, connect
+from tempfile import TemporaryDirectory
+from typing import List
+
+from pytest import raises
+
+from ledger.database import SQLite, Transaction
+from migrations import Version, add_time_column, fuse, migrate
+
+
+def test_fuse():
+    converter = fuse([add_time_column, lambda row: row + ["end"]])
+    assert converter(list("abcdefghij")) == list("abcdefgh") + ["", "i", "j", "end"]
+
+
+def test_migrate():
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        rows = [[str(column) for column in range(11)] for _ in range(3)]
+        with open(path / "transactions.csv", "w", encoding="latin-1") as output:
+            writer(output).writerows(rows)
+        (path / "tags.csv").write_text("weekly,1\n")
+        assert migrate(path, path, Version("0.1.0"), Version("0.2.0")) == "0.2.0"
+        with open(path / "transactions.csv", encoding="latin-1") as csvfile:
+            migrated = list(reader(csvfile))
+        assert migrated == [row[:8] + [""] + row[8:] for row in rows]
+        assert (path / "tags.csv").read_text() == "weekly,1\n"
+        assert sorted(file.name for file in path.iterdir()) == [
+            "tags.csv",
+            "transactions.csv",
+        ]
+        assert migrate(path, path, Version("0.2.0"), Version("0.2.0")) == ""
+        with open(path / "transactions.csv", encoding="latin-1") as csvfile:
+            assert list(reader(csvfile)) == migrated
+        output = path / "output"
+        output.mkdir()
+        migrate(path, output, Version("0.2.0"), Version("0.2.0"))
+        assert (output / "tags.csv").read_text() == "weekly,1\n"
+
+
+def test_migrate_failure():
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        (path / "transactions.csv").write_text("0,1,2,3,4,5,6,7,8,9,10\n")
+        (path / "version").write_text("0.1.0")
+        connection = connect(path / "ledger.db")
+        connection.execute("CREATE TABLE transactions (value)")
+        connection.close()
+        with raises(OperationalError):
+            migrate(path, path, Version("0.1.0"), Version("0.2.0"))
+        assert (path / "transactions.csv").read_text() == "0,1,2,3,4,5,6,7,8,9,10\n"
+        assert (path / "version").read_text() == "0.1.0"
+        assert sorted(file.name for file in path.iterdir()) == [
+            "ledger.db",
+            "transactions.csv",
+            "version",
+        ]
+        (path / "ledger.db").unlink()
+        assert migrate(path, path, Version("0.1.0"), Version("0.2.0")) == "0.2.0"
+        assert (path / "version").read_text() == "0.2.0"
+
+
+def test_migrate_database(stored_transactions: List[Transaction]):
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        columns = [column for column in Transaction.__dataclass_fields__]
+        columns.remove("time")
+        connection = connect(path / "ledger.db")
+        connection.execute(f"CREATE TABLE transactions ({', '.join(columns)})")
+        connection.execute('CREATE TABLE tags (name, "transaction")')
+        for rowid, transaction in zip([1, 2, 3, 5, 6], stored_transactions):
+            row = list(astuple(transaction))
+            del row[8]
+            connection.execute(
+                f"INSERT INTO transactions (rowid, {', '.join(columns)}) "
+                f"VALUES (?, {', '.join(['?'] * len(columns))})",
+                [rowid, *row],
+            )
+        connection.execute("INSERT INTO tags VALUES ('weekly', 5)")
+        connection.commit()
+        connection.close()
+        assert migrate(path, path, Version("0.1.0"), Version("0.2.0")) == "0.2.0"
+        assert not (path / "ledger.tmp").exists()
+        db = SQLite(path)
+        assert db.persistent
+        assert db.transactions.get_many(order="rowid") == stored_transactions
+        assert [row[0] for row in db.transactions.select("rowid", order="rowid")] == [
+            1,
+            2,
+            3,
+            5,
+            6,
+        ]
+        assert db.transactions.distinct("time") == set()
+        assert db.tags.select() == [("weekly", 5)]
+        assert db.checkpoints.count() == 1
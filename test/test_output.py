@@ -0,0 +1,39 @@
+from io import StringIO
+from re import sub
+
+import colorful
+
+from ledger.output import Table
+
+
+def plain(text: str) -> str:
+    return sub(r"\x1b\[\d+m", "", text)
+
+
+def test_table():
+    data = [("2020-01-01", "Rent", -500.0, 3), ("2020-01-02", "Salary", 2000.0, 4)]
+    table = Table(["date", "subject", "value", "id"], data)
+    assert table.widths == [10, 7, 7, 2]
+    lines = plain(table.header() + "\n" + table.rows()).splitlines()
+    assert len(lines) == 6
+    assert len(set(map(len, lines))) == 1
+    assert lines[3] == "│ 2020-01-01 │ Rent    │ -500.00 │  3 │"
+    assert str(colorful.red("-500.00")) in table.rows()
+
+
+def test_table_stream():
+    data = iter([("a", 1.0), ("abcdef", 2.0), ("abcdefgh", 3.0)])
+    table = Table(["name", "value"], data, sample=2)
+    assert table.widths == [6, 5]
+    output = StringIO()
+    table.show(output, chunk=2)
+    lines = plain(output.getvalue()).splitlines()
+    assert len(lines) == 7
+    assert lines[5] == "│ abcde… │  3.00 │"
+    table = Table(["name"], iter([("a",)]), widths=[3])
+    assert plain(table.rows()).splitlines()[0] == "│ a   │"
+    data = iter([("a", 1.0), ("b", -12345.67)])
+    table = Table(["name", "value"], data, sample=1)
+    assert plain(table.rows()).splitlines()[1] == "│ b    │ -123… │"
+    table = Table(["id"], iter([(1,), (123,)]), sample=1)
+    assert plain(table.rows()).splitlines()[1] == "│ 1… │"
@@ -0,0 +1,34 @@
+from json import loads
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from ledger import profiling
+from ledger.database import SQLite
+
+
+def test_span():
+    profiling.reset()
+    with profiling.span("step", 10):
+        pass
+    with profiling.span("step") as record:
+        record.rows += 5
+    assert record.calls == 2
+    assert record.rows == 15
+    assert record.seconds > 0
+    assert "step" in profiling.report()
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "profile.json"
+        profiling.dump(path)
+        assert loads(path.read_text())["step"]["rows"] == 15
+    profiling.reset()
+    assert not profiling.spans
+
+
+def test_database_spans():
+    profiling.reset()
+    db = SQLite(Path(__file__).parent / "data")
+    db.load()
+    db.transactions.check()
+    rows = db.transactions.count() + db.tags.count()
+    assert profiling.spans["load"].rows == rows
+    assert profiling.spans["check"].calls == 1
@@ -1,4 +1,6 @@
-from ledger.queries import Query
+from pytest import importorskip, raises
+
+from ledger.queries import Filter, Query, where
 
 
 def test_simple_query(parsed_transactions):
@@ -20,3 +22,44 @@ def test_regex_query(parsed_transactions):
 def test_substring_query(parsed_transactions):
     parsed_transaction = parsed_transactions[2]
     assert Query("subject has Hub")(parsed_transaction)
+
+
+def test_filter(stored_transactions, parsed_transactions):
+    importorskip("numpy")
+    transactions = stored_transactions + parsed_transactions[2:]
+    lists = Filter(transactions)
+    columns = Filter(transactions, columnar=True)
+    for query in [
+        Query("value < -10"),
+        Query("date >= 2015-06-05"),
+        lambda transaction: transaction.type == "payment",
+        Query("subject has (REWE|Hotels)"),
+    ]:
+        lists.add(query)
+        columns.add(query)
+        assert columns.result == lists.result
+    assert [transaction.subject for transaction in columns.result] == [
+        "REWE SAGT DANKE. 42655603",
+        "NH Hotels",
+    ]
+    columns.pop()
+    assert len(columns.result) == 4
+
+
+def test_sql(db, stored_transactions):
+    queries = [Query("date is 2015-06-05"), Query(r"subject has ^(REWE|PENNY)\b")]
+    assert where(queries) == (
+        '"date" = ? AND "subject" REGEXP ?',
+        ["2015-06-05", r"^(REWE|PENNY)\b"],
+    )
+    condition, parameters = where(queries)
+    transactions = db.transactions.get_many(
+        order="rowid", where=condition, parameters=parameters
+    )
+    assert transactions == [stored_transactions[2], stored_transactions[4]]
+    lists = Filter(stored_transactions)
+    for query in queries:
+        lists.add(query)
+    assert lists.where() == where(queries)
+    with raises(TypeError):
+        where([lambda transaction: True])
@@ -0,0 +1,65 @@
+from distutils.dir_util import copy_tree
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List
+from unittest.mock import patch
+
+from pytest import importorskip, raises
+
+from ledger.database import SQLite, Transaction
+from ledger.queries import Columns, Filter, Query
+from ledger.snapshot import Snapshot, current, load, write
+
+
+def test_snapshot(
+    stored_transactions: List[Transaction], parsed_transactions: List[Transaction]
+):
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        copy_tree(str(Path(__file__).parent / "data"), tmp_dir)
+        db = SQLite(path)
+        db.load()
+        db.save()
+        assert load(db.snapshot, db.source) is None
+        unloaded = SQLite(path)
+        snapshot = current(unloaded)
+        assert not unloaded.transactions.count()
+        assert list(snapshot) == db.transactions.get_many(order="rowid")
+        assert snapshot[-1].subject == db.transactions.get_one(rowid=5).subject
+        assert snapshot[0].valuta == stored_transactions[0].valuta
+        assert snapshot[1:3] == list(snapshot)[1:3]
+        with raises(IndexError):
+            snapshot[5]
+        snapshot.close()
+
+        db.transactions.add_many(parsed_transactions[2:])
+        db.save()
+        assert load(db.snapshot, db.source) is None
+        snapshot = current(db)
+        assert len(snapshot) == 10
+        assert load(db.snapshot, db.source) is not None
+        (path / "transactions.csv").write_text("")
+        assert load(db.snapshot, db.source) is None
+
+        importorskip("numpy")
+        for columnar in [False, True]:
+            transactions = Filter(snapshot, columnar)
+            transactions.add(Query("value > 0"))
+            transactions.add(Query("date >= 2015-10-01"))
+            assert [row.saldo for row in transactions.result] == [8240.3]
+        subjects = [row.subject for row in snapshot]
+        columns = Columns(snapshot)
+        with patch.object(Snapshot, "__getitem__", side_effect=AssertionError):
+            assert list(columns["subject"]) == subjects
+        assert list(columns["value"]) == [row.value for row in snapshot]
+        snapshot.close()
+
+
+def test_empty_snapshot():
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        (path / "source").write_text("")
+        write(path / "snapshot", [], path / "source")
+        snapshot = load(path / "snapshot", path / "source")
+        assert snapshot is not None and len(snapshot) == 0
+        snapshot.close()
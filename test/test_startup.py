@@ -0,0 +1,14 @@
+from subprocess import run
+from sys import executable
+
+heavy = ["IPython", "traitlets", "litecli", "colorful", "yaml", "numpy"]
+
+
+def test_lazy_imports():
+    script = (
+        "import sys, ledger.client, ledger.parsers;"
+        "print(' '.join(module for module in sys.modules if '.' not in module))"
+    )
+    result = run([executable, "-c", script], capture_output=True, text=True, check=True)
+    modules = set(result.stdout.split())
+    assert not modules.intersection(heavy)
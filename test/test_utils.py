@@ -1,7 +1,60 @@
-from datetime import date
+from csv import reader
+from datetime import date, datetime
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
-from ledger.utils import isodate
+from pytest import raises
+
+from ledger.utils import (
+    batched,
+    isodate,
+    reverse_lines,
+    reverse_records,
+    str2date,
+    str2datetime,
+    str2float,
+)
 
 
 def test_isodate():
     assert date(2020, 2, 20) == isodate("2020-02-20")
+    assert isodate("2020-02-20") is isodate("2020-02-20")
+
+
+def test_str2date():
+    assert str2date("02.10.2015") == date(2015, 10, 2)
+    assert str2datetime("02.10.2015 07:45") == datetime(2015, 10, 2, 7, 45)
+    for value in ["2.10.2015", "02/10/2015", "31.02.2015"]:
+        with raises(ValueError):
+            str2date(value)
+    with raises(ValueError):
+        str2datetime("02.10.2015 7:45")
+
+
+def test_str2float():
+    assert str2float("-3.975,91") == -3975.91
+
+
+def test_reverse_lines():
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "lines.txt"
+        path.write_text("first\nsecond;ä\n\nlast\n", encoding="latin-1")
+        lines = ["last", "", "second;ä", "first"]
+        assert list(reverse_lines(path, "latin-1")) == lines
+        assert list(reverse_lines(path, "latin-1", size=3)) == lines
+
+
+def test_reverse_records():
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "records.csv"
+        content = 'a;"one\r\n""two"";\r\nthree";b\r\nc;d\r\n"e\r\n";f\r\n'
+        path.write_bytes(content.encode())
+        for size in [3, 1 << 16]:
+            records = list(reader(reverse_records(path, size=size), delimiter=";"))
+            forward = list(reader(StringIO(content, newline=None), delimiter=";"))
+            assert records == forward[::-1]
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]